@@ -0,0 +1,78 @@
+# ----------------------------------------------------------------------------#
+# Archiving of past shows.
+#
+#   flask archive shows                      # older than SHOW_ARCHIVE_AFTER_DAYS
+#   flask archive shows --before 2025-01-01
+#
+# Shows that started before the cutoff move from shows to shows_archive a batch
+# at a time, oldest first, and each batch is committed on its own, so a large
+# backlog never holds one long transaction and shows keeps only the recent past
+# and the upcoming shows its indexes have to cover. On PostgreSQL a batch is one
+# DELETE ... RETURNING feeding the INSERT; elsewhere the batch's ids are read
+# first. Archived shows no longer appear among the past shows of venue and
+# artist pages, which, like the /shows windows, follow the 'shows' cache
+# generation that archiving moves. Only shows that have already started can be
+# archived: they no longer count towards any upcoming show counter.
+# ----------------------------------------------------------------------------#
+
+from datetime import datetime, timedelta
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import select
+
+from models import db, Show, ShowArchive
+import cache
+
+COLUMNS = ('id', 'artist_id', 'venue_id', 'start_time', 'duration_minutes', 'updated_at')
+
+archive_cli = AppGroup('archive', help='Move past rows out of the hot tables.')
+
+
+def _archive_batch(before, batch_size):
+    shows, archived = Show.__table__, ShowArchive.__table__
+    batch = select([shows.c.id]).where(shows.c.start_time < before). \
+        order_by(shows.c.start_time, shows.c.id).limit(batch_size)
+
+    if db.engine.dialect.name == 'postgresql':
+        moved = shows.delete().where(shows.c.id.in_(batch.with_for_update(skip_locked=True))). \
+            returning(*[shows.c[column] for column in COLUMNS]).cte('moved')
+        return db.session.execute(archived.insert().from_select(
+            COLUMNS, select([moved.c[column] for column in COLUMNS]))).rowcount
+
+    ids = [show_id for show_id, in db.session.execute(batch)]
+    if ids:
+        db.session.execute(archived.insert().from_select(
+            COLUMNS, select([shows.c[column] for column in COLUMNS]).where(shows.c.id.in_(ids))))
+        db.session.execute(shows.delete().where(shows.c.id.in_(ids)))
+    return len(ids)
+
+
+def archive_shows(before, batch_size):
+    total = 0
+    while True:
+        moved = _archive_batch(before, batch_size)
+        db.session.commit()
+        total += moved
+        if moved < batch_size:
+            return total
+
+
+@archive_cli.command('shows')
+@click.option('--before', type=click.DateTime(), help='Archive shows that started before this time.')
+@click.option('--batch-size', default=5000, show_default=True, help='Shows moved per transaction.')
+def archive_shows_command(before, batch_size):
+    """Move shows that started before the cutoff to shows_archive."""
+    now = datetime.now()
+    if before is not None and before > now:
+        raise click.BadParameter('upcoming shows cannot be archived, give a time in the past', param_hint='--before')
+    before = before or now - timedelta(days=current_app.config['SHOW_ARCHIVE_AFTER_DAYS'])
+    archived = archive_shows(before, batch_size)
+    if archived:
+        cache.invalidate('shows')
+    click.echo(f'archived {archived} shows that started before {before}')
+
+
+def init_app(app):
+    app.config.setdefault('SHOW_ARCHIVE_AFTER_DAYS', 365)
+    app.cli.add_command(archive_cli)
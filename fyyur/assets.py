@@ -0,0 +1,284 @@
+# ----------------------------------------------------------------------------#
+# Static asset pipeline.
+#
+# `flask assets build` bundles the stylesheets and scripts of layouts/main.html
+# (BUNDLES), minified, into static/dist under names carrying a hash of their
+# content, next to gzip and brotli copies compressed once at build time. The
+# images in IMAGES get hashed, resized WebP variants and a re-encoded fallback.
+# static/dist/manifest.json maps every source name to its built file. A build
+# keeps the files of the previous one, which pages rendered before a deploy and
+# still held by browsers and CDNs keep linking to, and removes anything older.
+#
+# Templates ask asset_urls(bundle), asset_url(name) and asset_srcset(name) for
+# URLs. With ASSETS_BUNDLED set and a manifest built they point at static/dist,
+# which is served with the precompressed copy the client accepts and a year
+# long, immutable Cache-Control: a changed file gets a new name, so a cached
+# one never has to be checked again. Otherwise (development) they point at the
+# sources.
+#
+# rcssmin and rjsmin minify, brotli writes the .br copies and Pillow makes the
+# image variants; the build leaves out whatever step is not installed.
+# ----------------------------------------------------------------------------#
+
+import gzip
+import hashlib
+import io
+import json
+import mimetypes
+import os
+import click
+from flask import current_app, request, send_from_directory, url_for
+from flask.cli import AppGroup
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# in the order the layout loads them; the bundles stay in static/dist, one
+# level below static like css/ and js/, so relative url()s keep resolving
+BUNDLES = {
+    'main.css': ['css/bootstrap.min.css', 'css/layout.main.css', 'css/main.css',
+                 'css/main.responsive.css', 'css/main.quickfix.css'],
+    'head.js': ['js/libs/modernizr-2.8.2.min.js', 'js/libs/moment.min.js'],
+    # deferred; jQuery itself still comes from its CDN before these run
+    'main.js': ['js/script.js', 'js/libs/bootstrap-3.1.1.min.js', 'js/plugins.js'],
+}
+
+# files referenced on their own, copied under a hashed name; the small
+# animated logo only grows as a WebP
+FILES = ['js/libs/respond-1.4.2.min.js', 'fire.gif']
+
+# image -> widths of its WebP variants; the largest also sizes the fallback,
+# no widths keeps the original size
+IMAGES = {
+    'img/front-splash.jpg': [640, 1280],
+}
+
+DIST = 'dist'
+MANIFEST = 'manifest.json'
+COMPRESSED_TYPES = ('.css', '.js')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+assets_cli = AppGroup('assets', help='Build the static asset bundles.')
+
+
+# ----------------------------------------------------------------------------#
+# Building.
+# ----------------------------------------------------------------------------#
+
+def _hashed_name(name, content):
+    stem, extension = os.path.splitext(os.path.basename(name))
+    return f'{stem}.{hashlib.sha1(content).hexdigest()[:12]}{extension}'
+
+
+def _gzip(content):
+    # a fixed mtime keeps the output, and so the ETag, the same across builds
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode='wb', compresslevel=9, mtime=0) as compressed:
+        compressed.write(content)
+    return buffer.getvalue()
+
+
+def _write(dist, name, content):
+    filename = _hashed_name(name, content)
+    with open(os.path.join(dist, filename), 'wb') as output:
+        output.write(content)
+    sizes = [len(content)]
+    if filename.endswith(COMPRESSED_TYPES):
+        variants = [('.gz', _gzip)] + ([('.br', lambda data: brotli.compress(data, quality=11))] if brotli else [])
+        for suffix, compress in variants:
+            compressed = compress(content)
+            with open(os.path.join(dist, filename + suffix), 'wb') as output:
+                output.write(compressed)
+            sizes.append(len(compressed))
+    click.echo(f'{filename:<48} ' + ' / '.join(f'{size / 1024:8.1f} KiB' for size in sizes))
+    return f'{DIST}/{filename}'
+
+
+def _minify(name, source):
+    if name.endswith('.min.css') or name.endswith('.min.js'):
+        return source
+    if name.endswith('.css') and rcssmin:
+        return rcssmin.cssmin(source)
+    if name.endswith('.js') and rjsmin:
+        return rjsmin.jsmin(source)
+    return source
+
+
+def _bundle(static, sources):
+    parts = []
+    for name in sources:
+        with open(os.path.join(static, name), encoding='utf-8') as source:
+            parts.append(_minify(name, source.read()))
+    # a newline and a semicolon keep one script's last statement from running into the next
+    separator = ';\n' if sources[0].endswith('.js') else '\n'
+    return separator.join(parts).encode('utf-8')
+
+
+def _encode(image, image_format):
+    buffer = io.BytesIO()
+    animated = getattr(image, 'is_animated', False)
+    if image_format == 'WEBP':
+        image.save(buffer, 'WEBP', quality=80, method=6, save_all=animated)
+    else:
+        image.save(buffer, 'JPEG', quality=80, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def _resized(image, width):
+    if not width or width >= image.width:
+        return image
+    resized = image.convert('RGB') if image.mode not in ('RGB', 'L') else image.copy()
+    resized.thumbnail((width, image.height))
+    return resized
+
+
+def _images(static, dist, name, widths):
+    # (fallback file, [(webp file, width), ...])
+    path = os.path.join(static, name)
+    with open(path, 'rb') as source:
+        original = source.read()
+    if Image is None:
+        return _write(dist, name, original), []
+
+    image = Image.open(path)
+    variants = []
+    for width in widths or [None]:
+        resized = _resized(image, width)
+        stem = os.path.splitext(name)[0] + (f'-{resized.width}' if width else '')
+        variants.append((_write(dist, stem + '.webp', _encode(resized, 'WEBP')), resized.width))
+
+    if image.format == 'JPEG' and widths:
+        stem = os.path.splitext(name)[0] + f'-{max(widths)}'
+        return _write(dist, stem + '.jpg', _encode(_resized(image, max(widths)), 'JPEG')), variants
+    return _write(dist, name, original), variants
+
+
+def _built_files(manifest):
+    # the files in static/dist a manifest links to, with their compressed copies
+    names = list(manifest["bundles"].values()) + list(manifest["files"].values()) + \
+        [filename for variants in manifest["webp"].values() for filename, _ in variants]
+    return {os.path.basename(name) + suffix for name in names for suffix in ('', '.gz', '.br')}
+
+
+def _read_manifest(path):
+    if not os.path.isfile(path):
+        return None
+    with open(path) as source:
+        return json.load(source)
+
+
+def build(static):
+    dist = os.path.join(static, DIST)
+    os.makedirs(dist, exist_ok=True)
+    previous = _read_manifest(os.path.join(dist, MANIFEST))
+
+    manifest = {"bundles": {}, "files": {}, "webp": {}}
+    for bundle, sources in BUNDLES.items():
+        manifest["bundles"][bundle] = _write(dist, bundle, _bundle(static, sources))
+    for name in FILES:
+        with open(os.path.join(static, name), 'rb') as source:
+            manifest["files"][name] = _write(dist, name, source.read())
+    for name, widths in IMAGES.items():
+        manifest["files"][name], manifest["webp"][name] = _images(static, dist, name, widths)
+
+    # written aside and renamed, so a worker starting meanwhile never reads half a manifest
+    with open(os.path.join(dist, MANIFEST + '.tmp'), 'w') as output:
+        json.dump(manifest, output, indent=2, sort_keys=True)
+    os.replace(os.path.join(dist, MANIFEST + '.tmp'), os.path.join(dist, MANIFEST))
+
+    kept = _built_files(manifest) | (_built_files(previous) if previous else set()) | {MANIFEST}
+    for filename in os.listdir(dist):
+        if filename not in kept:
+            os.remove(os.path.join(dist, filename))
+    return manifest
+
+
+@assets_cli.command('build')
+def build_command():
+    """Bundle, fingerprint and precompress the static assets into static/dist."""
+    for module, step in ((rcssmin, 'rcssmin: stylesheets are not minified'),
+                         (rjsmin, 'rjsmin: scripts are not minified'),
+                         (brotli, 'brotli: no .br copies'),
+                         (Image, 'Pillow: no WebP images')):
+        if module is None:
+            click.echo(step, err=True)
+    manifest = build(current_app.static_folder)
+    click.echo(f'wrote {os.path.join(current_app.static_folder, DIST, MANIFEST)} '
+               f'({sum(len(entries) for entries in manifest.values())} entries)')
+
+
+# ----------------------------------------------------------------------------#
+# Templates and serving.
+# ----------------------------------------------------------------------------#
+
+def _manifest():
+    return current_app.extensions['assets']
+
+
+def asset_urls(bundle):
+    manifest = _manifest()
+    if manifest:
+        return [url_for('static', filename=manifest["bundles"][bundle])]
+    return [url_for('static', filename=name) for name in BUNDLES[bundle]]
+
+
+def asset_url(name):
+    manifest = _manifest()
+    return url_for('static', filename=manifest["files"].get(name, name) if manifest else name)
+
+
+def asset_srcset(name):
+    manifest = _manifest()
+    if not manifest:
+        return ''
+    return ', '.join(f'{url_for("static", filename=filename)} {width}w'
+                     for filename, width in manifest["webp"].get(name, ()))
+
+
+def serve_dist(filename):
+    # the precompressed copy the client accepts, with the original's content type
+    directory = os.path.join(current_app.static_folder, DIST)
+    sent, encoding = filename, None
+    if filename.endswith(COMPRESSED_TYPES):
+        for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if candidate in request.accept_encodings and os.path.isfile(os.path.join(directory, filename + suffix)):
+                sent, encoding = filename + suffix, candidate
+                break
+    response = send_from_directory(directory, sent, mimetype=mimetypes.guess_type(filename)[0])
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if filename.endswith(COMPRESSED_TYPES):
+        response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = IMMUTABLE
+    return response
+
+
+def init_app(app):
+    app.config.setdefault('ASSETS_BUNDLED', False)
+    manifest_path = os.path.join(app.static_folder, DIST, MANIFEST)
+    manifest = _read_manifest(manifest_path) if app.config['ASSETS_BUNDLED'] else None
+    app.extensions['assets'] = manifest
+    # read by http_cache, whose validators change with the manifest
+    app.extensions['assets_manifest'] = manifest_path if manifest else None
+    app.add_template_global(asset_urls)
+    app.add_template_global(asset_url)
+    app.add_template_global(asset_srcset)
+    app.add_url_rule(f'{app.static_url_path}/{DIST}/<path:filename>', 'assets', serve_dist)
+    app.cli.add_command(assets_cli)
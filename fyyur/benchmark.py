@@ -0,0 +1,263 @@
+# ----------------------------------------------------------------------------#
+# Benchmark harness.
+#
+#   flask bench seed --venues 2000 --artists 5000 --shows 100000 --reset
+#   flask bench run -o bench-results.json --baseline bench-baseline.json
+#
+# `seed` fills the configured database with reproducible synthetic data (the
+# same --seed always produces the same rows). `run` drives every read route
+# through the test client and reports p50/p95/p99 latency and SQL statements
+# per request for each, plus the peak RSS of the process. The results are
+# written as JSON; given a baseline, the command fails when a route got slower
+# than the baseline p95 by more than --tolerance or issues more statements.
+# Point DATABASE_URL at a scratch database before seeding.
+# ----------------------------------------------------------------------------#
+
+import json
+import os
+import random
+import resource
+import sys
+import time
+from datetime import datetime, timedelta
+from itertools import islice
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import event, func
+
+from forms import VenueForm, ArtistForm
+from models import db, Venue, Artist, Show
+import bulk
+import cache
+import counters
+
+ROUTES = [
+    '/',
+    '/venues',
+    '/venues?page=2',
+    '/venues/search?search_term=the',
+    '/venues/{venue_id}',
+    '/artists',
+    '/artists/search?search_term=band',
+    '/artists/{artist_id}',
+    '/shows',
+    '/shows/search?search_term=jazz',
+    '/api/venues',
+    '/api/artists',
+    '/api/shows',
+    '/api/shows?state=NY',
+    '/venues/create',
+    '/artists/create',
+    '/shows/create',
+]
+
+STATES = [value for value, _ in VenueForm.state.kwargs['choices']]
+GENRES = [value for value, _ in ArtistForm.genres.kwargs['choices']]
+CITIES = ['San Francisco', 'New York', 'Austin', 'Chicago', 'Seattle', 'Denver', 'Boston', 'Portland',
+          'Nashville', 'New Orleans', 'Atlanta', 'Detroit', 'Miami', 'Phoenix', 'Minneapolis']
+WORDS = ['The', 'Blue', 'Velvet', 'Iron', 'Moon', 'Electric', 'Garden', 'Wild', 'Silver', 'Jazz',
+         'Hall', 'Room', 'Band', 'Club', 'Echo', 'Social', 'Union', 'Lounge', 'Brothers', 'Quartet']
+
+bench_cli = AppGroup('bench', help='Seed synthetic data and benchmark the read routes.')
+
+
+# ----------------------------------------------------------------------------#
+# Synthetic data.
+# ----------------------------------------------------------------------------#
+
+def _name(rng):
+    return ' '.join(rng.sample(WORDS, rng.randint(2, 4)))
+
+
+def _phone(rng):
+    return f'{rng.randint(200, 999)}-{rng.randint(200, 999)}-{rng.randint(1000, 9999)}'
+
+
+def _venues(rng, count):
+    for venue_id in range(1, count + 1):
+        yield {
+            'id': venue_id, 'name': _name(rng), 'city': rng.choice(CITIES), 'state': rng.choice(STATES),
+            'address': f'{rng.randint(1, 9999)} {rng.choice(WORDS)} Street', 'phone': _phone(rng),
+            'genres': rng.sample(GENRES, rng.randint(1, 3)), 'image_link': None,
+            'website': None, 'facebook_link': None,
+            'seeking_talent': rng.random() < 0.3, 'seeking_description': None,
+        }
+
+
+def _artists(rng, count):
+    for artist_id in range(1, count + 1):
+        yield {
+            'id': artist_id, 'name': _name(rng), 'city': rng.choice(CITIES), 'state': rng.choice(STATES),
+            'phone': _phone(rng), 'genres': rng.sample(GENRES, rng.randint(1, 3)), 'image_link': None,
+            'website': None, 'facebook_link': None,
+            'seeking_venue': rng.random() < 0.3, 'seeking_description': None,
+        }
+
+
+def _shows(rng, count, venues, artists, now):
+    # two-hour shows a year either side of today, on the hour; draws that would
+    # double-book a venue or an artist are drawn again
+    booked = set()
+    show_id = 0
+    while show_id < count:
+        artist_id, venue_id = rng.randint(1, artists), rng.randint(1, venues)
+        hour = rng.randint(-24 * 365, 24 * 365)
+        if any(('artist', artist_id, hour + offset) in booked or ('venue', venue_id, hour + offset) in booked
+               for offset in (-1, 0, 1)):
+            continue
+        booked.update({('artist', artist_id, hour), ('venue', venue_id, hour)})
+        show_id += 1
+        yield {
+            'id': show_id, 'artist_id': artist_id, 'venue_id': venue_id,
+            'start_time': now + timedelta(hours=hour), 'duration_minutes': 120,
+        }
+
+
+@bench_cli.command('seed')
+@click.option('--venues', default=500, show_default=True)
+@click.option('--artists', default=1000, show_default=True)
+@click.option('--shows', default=20000, show_default=True)
+@click.option('--seed', default=1, show_default=True, help='Random seed; the same seed gives the same data.')
+@click.option('--reset', is_flag=True, help='Drop and recreate the tables first.')
+@click.option('--batch-size', default=5000, show_default=True)
+def seed_command(venues, artists, shows, seed, reset, batch_size):
+    """Fill the database with reproducible synthetic venues, artists and shows."""
+    if reset:
+        db.drop_all()
+        db.create_all()
+    elif db.session.query(func.count(Show.id)).scalar():
+        raise click.ClickException('the database already has shows, pass --reset to replace them')
+
+    rng = random.Random(seed)
+    now = datetime.now().replace(minute=0, second=0, microsecond=0)
+    for model, rows in ((Venue, _venues(rng, venues)), (Artist, _artists(rng, artists)),
+                        (Show, _shows(rng, shows, venues, artists, now))):
+        started = time.perf_counter()
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            bulk.insert_batch(model.__table__, batch)
+            db.session.commit()
+        bulk.sync_sequence(model.__table__)
+        db.session.commit()
+        cache.invalidate(model.__tablename__)
+        click.echo(f'seeded {model.__tablename__} in {time.perf_counter() - started:.1f}s')
+
+    counters.recompute()
+    db.session.commit()
+
+
+# ----------------------------------------------------------------------------#
+# Running the benchmark.
+# ----------------------------------------------------------------------------#
+
+def _percentile(values, percent):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))]
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def _measure(client, path, requests):
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements[-1] += 1
+
+    latencies = []
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        for _ in range(requests):
+            statements.append(0)
+            started = time.perf_counter()
+            response = client.get(path, buffered=True)
+            latencies.append((time.perf_counter() - started) * 1000)
+            response.close()
+            if response.status_code != 200:
+                raise click.ClickException(f'GET {path} answered {response.status_code}')
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+
+    return {
+        'requests': requests,
+        'p50_ms': round(_percentile(latencies, 50), 3),
+        'p95_ms': round(_percentile(latencies, 95), 3),
+        'p99_ms': round(_percentile(latencies, 99), 3),
+        'queries_per_request': round(sum(statements) / requests, 2),
+    }
+
+
+def _regressions(results, baseline, tolerance):
+    for route, current in results['routes'].items():
+        previous = baseline.get('routes', {}).get(route)
+        if previous is None:
+            continue
+        if current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            yield f'{route}: p95 {current["p95_ms"]:.1f} ms, baseline {previous["p95_ms"]:.1f} ms'
+        if current['queries_per_request'] > previous['queries_per_request']:
+            yield (f'{route}: {current["queries_per_request"]} statements per request, '
+                   f'baseline {previous["queries_per_request"]}')
+
+
+@bench_cli.command('run')
+@click.option('--requests', default=50, show_default=True, help='Timed requests per route.')
+@click.option('--warmup', default=5, show_default=True, help='Untimed requests per route.')
+@click.option('--page-cache/--no-page-cache', default=False, show_default=True,
+              help='Serve cached pages; off by default so every request renders.')
+@click.option('-o', '--output', type=click.Path(dir_okay=False), help='Write the results as JSON.')
+@click.option('--baseline', type=click.Path(dir_okay=False),
+              help='Results of an earlier run to compare against; skipped if the file does not exist yet.')
+@click.option('--tolerance', default=0.25, show_default=True,
+              help='Allowed p95 slowdown against the baseline, as a fraction.')
+def run_command(requests, warmup, page_cache, output, baseline, tolerance):
+    """Benchmark the read routes and compare against a baseline."""
+    ids = {
+        'venue_id': db.session.query(func.min(Venue.id)).scalar(),
+        'artist_id': db.session.query(func.min(Artist.id)).scalar(),
+    }
+    if None in ids.values():
+        raise click.ClickException('the database is empty, run `flask bench seed` first')
+
+    client = current_app.test_client()
+    with cache.pages_enabled(page_cache):
+        routes = {}
+        for route in ROUTES:
+            path = route.format(**ids)
+            for _ in range(warmup):
+                client.get(path, buffered=True).close()
+            routes[route] = _measure(client, path, requests)
+            click.echo('{:<40} p50 {p50_ms:8.2f} ms  p95 {p95_ms:8.2f} ms  p99 {p99_ms:8.2f} ms  '
+                       '{queries_per_request:6.2f} queries'.format(route, **routes[route]))
+
+    results = {
+        'created': datetime.utcnow().isoformat(timespec='seconds'),
+        'database': db.engine.dialect.name,
+        'rows': {model.__tablename__: db.session.query(func.count(model.id)).scalar()
+                 for model in (Venue, Artist, Show)},
+        'peak_rss_mb': round(_peak_rss_mb(), 1),
+        'routes': routes,
+    }
+    click.echo(f'peak RSS {results["peak_rss_mb"]} MB')
+    if output:
+        with open(output, 'w') as results_file:
+            json.dump(results, results_file, indent=2)
+
+    if baseline and not os.path.exists(baseline):
+        click.echo(f'no baseline at {baseline}, nothing to compare against', err=True)
+    elif baseline:
+        with open(baseline) as baseline_file:
+            regressions = list(_regressions(results, json.load(baseline_file), tolerance))
+        for regression in regressions:
+            click.echo(f'REGRESSION {regression}', err=True)
+        if regressions:
+            raise click.ClickException(f'{len(regressions)} regressions against the baseline')
+
+
+def init_app(app):
+    app.cli.add_command(bench_cli)
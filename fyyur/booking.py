@@ -0,0 +1,88 @@
+# ----------------------------------------------------------------------------#
+# Double-booking of venues and artists.
+#
+# A show occupies its venue and its artist from start_time for duration_minutes.
+# On PostgreSQL two exclusion constraints on shows (btree_gist over the venue or
+# artist id and that time range) reject an overlapping show inside the INSERT
+# itself, with one index probe and no race between checking and writing. A
+# violation surfaces as an IntegrityError with pgcode 23P01, which violation()
+# turns into the message the forms show. Writers that report per-row errors,
+# like the batch endpoint and the bulk import, call conflicts() once a batch
+# has been rejected to find the clashing rows with a single query. Databases
+# without the constraints (SQLite test runs) call conflicts() before inserting.
+# ----------------------------------------------------------------------------#
+
+from datetime import timedelta
+from sqlalchemy import or_
+
+from models import db, Show
+
+EXCLUSION_VIOLATION = '23P01'
+
+# the longest show the forms accept, which bounds how far back a clash can start
+MAX_SHOW_MINUTES = 24 * 60
+
+VENUE_BOOKED = 'The venue is already booked at this time.'
+ARTIST_BOOKED = 'The artist is already booked at this time.'
+
+CONSTRAINT_MESSAGES = {
+    'ex_shows_venue_id_period': VENUE_BOOKED,
+    'ex_shows_artist_id_period': ARTIST_BOOKED,
+}
+
+
+def constrained():
+    return db.engine.dialect.name == 'postgresql'
+
+
+def violation(error):
+    # the form error for an IntegrityError raised by an exclusion constraint, else None;
+    # COPY raises the driver's own error rather than SQLAlchemy's wrapper around it
+    orig = getattr(error, 'orig', error)
+    if getattr(orig, 'pgcode', None) != EXCLUSION_VIOLATION:
+        return None
+    return CONSTRAINT_MESSAGES.get(orig.diag.constraint_name, VENUE_BOOKED)
+
+
+def _period(show):
+    return show["start_time"], show["start_time"] + timedelta(minutes=show["duration_minutes"])
+
+
+def _overlaps(period, periods):
+    start, end = period
+    return any(other_start < end and start < other_end for other_start, other_end in periods)
+
+
+def conflicts(shows):
+    # {key: message} for the shows of {key: {"artist_id", "venue_id", "start_time",
+    # "duration_minutes"}} that overlap a booked show, or an earlier show of the same batch
+    # that does not clash itself
+    if not shows:
+        return {}
+    periods = {key: _period(show) for key, show in shows.items()}
+    earliest = min(start for start, _ in periods.values()) - timedelta(minutes=MAX_SHOW_MINUTES)
+    latest = max(end for _, end in periods.values())
+    artist_ids = {show["artist_id"] for show in shows.values()}
+    venue_ids = {show["venue_id"] for show in shows.values()}
+
+    artist_periods, venue_periods = {}, {}
+    booked = db.session.query(Show.artist_id, Show.venue_id, Show.start_time, Show.duration_minutes). \
+        filter(Show.start_time >= earliest, Show.start_time < latest,
+               or_(Show.artist_id.in_(artist_ids), Show.venue_id.in_(venue_ids)))
+    for show in booked:
+        period = _period(show._asdict())
+        artist_periods.setdefault(show.artist_id, []).append(period)
+        venue_periods.setdefault(show.venue_id, []).append(period)
+
+    clashes = {}
+    for key, show in shows.items():
+        period = periods[key]
+        if _overlaps(period, artist_periods.get(show["artist_id"], ())):
+            clashes[key] = ARTIST_BOOKED
+        elif _overlaps(period, venue_periods.get(show["venue_id"], ())):
+            clashes[key] = VENUE_BOOKED
+        else:
+            # later shows of the batch clash with the earlier ones that will be booked
+            artist_periods.setdefault(show["artist_id"], []).append(period)
+            venue_periods.setdefault(show["venue_id"], []).append(period)
+    return clashes
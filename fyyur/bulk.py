@@ -0,0 +1,272 @@
+# ----------------------------------------------------------------------------#
+# Bulk import and export of venues, artists and shows.
+#
+#   flask data import venues venues.csv
+#   flask data import shows shows.jsonl --batch-size 5000
+#   flask data export shows -o shows.csv
+#
+# Rows are read as a stream and validated with the same forms the site uses.
+# Valid rows are written a batch at a time, with COPY on PostgreSQL and an
+# executemany INSERT elsewhere, and each batch is committed on its own. The
+# artist and venue ids of a batch of shows are checked with one query per
+# table. Exports read the table through a server-side cursor, so a table is
+# never held in memory as a whole.
+# ----------------------------------------------------------------------------#
+
+import csv
+import io
+import json
+import time
+from itertools import islice
+import click
+from flask.cli import AppGroup
+from sqlalchemy.exc import IntegrityError
+from werkzeug.datastructures import MultiDict
+
+from forms import VenueForm, ArtistForm, ShowForm
+from models import db, Venue, Artist, Show
+import booking
+import cache
+import counters
+import directory
+
+TABLES = {
+    'venues': (Venue, VenueForm),
+    'artists': (Artist, ArtistForm),
+    'shows': (Show, ShowForm),
+}
+
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+BOOLEAN_COLUMNS = ('seeking_talent', 'seeking_venue')
+
+data_cli = AppGroup('data', help='Bulk import and export of venues, artists and shows.')
+
+
+# ----------------------------------------------------------------------------#
+# Reading and validating rows.
+# ----------------------------------------------------------------------------#
+
+def _read_rows(stream, fmt):
+    if fmt == 'jsonl':
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        for row in csv.DictReader(stream):
+            if row.get('genres'):
+                row['genres'] = row['genres'].split(',')
+            yield row
+
+
+def _formdata(row):
+    pairs = []
+    for key, value in row.items():
+        if key in BOOLEAN_COLUMNS:
+            # a checkbox is either posted or missing
+            value = value if isinstance(value, bool) else str(value).strip().lower() in ('1', 'true', 'yes', 'y', 'on')
+        if value is None or value is False:
+            continue
+        for item in (value if isinstance(value, list) else [value]):
+            pairs.append((key, str(item).strip()))
+    return MultiDict(pairs)
+
+
+def _validate(form_class, row):
+    form = form_class(formdata=_formdata(row), meta={'csrf': False})
+    if not form.validate():
+        return None, '; '.join(f'{field}: {" ".join(messages)}' for field, messages in form.errors.items())
+    values = dict(form.data)
+    # only meaningful to the edit forms
+    values.pop('version', None)
+    if row.get('id'):
+        values['id'] = int(row['id'])
+    if form_class is ShowForm:
+        try:
+            values['artist_id'] = int(values['artist_id'])
+            values['venue_id'] = int(values['venue_id'])
+        except ValueError:
+            return None, 'artist_id and venue_id must be numbers'
+    return values, None
+
+
+def _missing_references(rows):
+    # one query per referenced table for the whole batch
+    known = {}
+    for column, model in (('artist_id', Artist), ('venue_id', Venue)):
+        ids = {row[column] for _, row in rows}
+        known[column] = {row_id for row_id, in db.session.query(model.id).filter(model.id.in_(ids))}
+    return {line: [column for column in known if row[column] not in known[column]] for line, row in rows}
+
+
+# ----------------------------------------------------------------------------#
+# Writing batches.
+# ----------------------------------------------------------------------------#
+
+def _copy_value(value):
+    if isinstance(value, list):
+        return '{' + ','.join('"' + item.replace('\\', '\\\\').replace('"', '\\"') + '"'
+                              for item in value) + '}'
+    if hasattr(value, 'strftime'):
+        return value.strftime(DATETIME_FORMAT)
+    return value
+
+
+def insert_batch(table, rows):
+    # rows: dicts of column values, written with COPY on PostgreSQL; the caller commits
+    columns = sorted(set().union(*rows))
+    if db.engine.dialect.name != 'postgresql':
+        db.session.execute(table.insert(), [{column: row.get(column) for column in columns} for row in rows])
+        return
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([_copy_value(row.get(column)) for column in columns])
+    buffer.seek(0)
+    cursor = db.session.connection().connection.cursor()
+    cursor.copy_expert(f'COPY {table.name} ({", ".join(columns)}) FROM STDIN WITH (FORMAT csv)', buffer)
+
+
+def _write_batch(model, rows):
+    insert_batch(model.__table__, rows)
+    if model is Show:
+        counters.refresh(Venue, {values['venue_id'] for values in rows})
+        counters.refresh(Artist, {values['artist_id'] for values in rows})
+    elif model is Venue:
+        directory.refresh_areas({(values['state'], values['city']) for values in rows})
+    db.session.commit()
+
+
+def _without_clashes(valid):
+    # the shows of the batch that double-book nobody, printing the others
+    clashes = booking.conflicts(dict(valid))
+    for line, message in sorted(clashes.items()):
+        click.echo(f'row {line}: {message}', err=True)
+    return [(line, values) for line, values in valid if line not in clashes]
+
+
+def sync_sequence(table):
+    # rows imported with explicit ids leave the id sequence behind
+    if db.engine.dialect.name == 'postgresql':
+        db.session.execute(f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                           f"COALESCE((SELECT MAX(id) FROM {table.name}), 1))")
+
+
+# ----------------------------------------------------------------------------#
+# Commands.
+# ----------------------------------------------------------------------------#
+
+@data_cli.command('import')
+@click.argument('table', type=click.Choice(sorted(TABLES)))
+@click.argument('source', type=click.File('r', encoding='utf-8'))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']),
+              help='Input format, guessed from the file extension by default.')
+@click.option('--batch-size', default=1000, show_default=True)
+def import_command(table, source, fmt, batch_size):
+    """Stream CSV or JSONL rows into venues, artists or shows."""
+    model, form_class = TABLES[table]
+    fmt = fmt or ('jsonl' if getattr(source, 'name', '').endswith(('.jsonl', '.json')) else 'csv')
+    rows = enumerate(_read_rows(source, fmt), start=1)
+    imported = rejected = 0
+    explicit_ids = False
+    started = time.perf_counter()
+
+    while True:
+        chunk = list(islice(rows, batch_size))
+        if not chunk:
+            break
+        valid = []
+        for line, row in chunk:
+            values, error = _validate(form_class, row)
+            if error:
+                rejected += 1
+                click.echo(f'row {line}: {error}', err=True)
+            else:
+                valid.append((line, values))
+
+        if model is Show and valid:
+            missing = _missing_references(valid)
+            for line, columns in missing.items():
+                if columns:
+                    rejected += 1
+                    click.echo(f'row {line}: unknown {" and ".join(columns)}', err=True)
+            valid = [(line, values) for line, values in valid if not missing[line]]
+            if not booking.constrained():
+                checked = _without_clashes(valid)
+                rejected += len(valid) - len(checked)
+                valid = checked
+
+        if valid:
+            try:
+                _write_batch(model, [values for _, values in valid])
+            except (IntegrityError, db.engine.dialect.dbapi.IntegrityError) as error:
+                # the exclusion constraints rejected the batch; write it again without the rows that clash
+                db.session.rollback()
+                if model is not Show or booking.violation(error) is None:
+                    raise
+                checked = _without_clashes(valid)
+                rejected += len(valid) - len(checked)
+                valid = checked
+                if valid:
+                    _write_batch(model, [values for _, values in valid])
+            imported += len(valid)
+            explicit_ids = explicit_ids or any('id' in values for _, values in valid)
+
+        elapsed = time.perf_counter() - started
+        click.echo(f'{imported} rows imported, {rejected} rejected, {imported / elapsed:.0f} rows/s', err=True)
+
+    if explicit_ids:
+        sync_sequence(model.__table__)
+        db.session.commit()
+    cache.invalidate(table)
+    click.echo(f'imported {imported} {table} in {time.perf_counter() - started:.1f}s, rejected {rejected}')
+
+
+def _export_value(value, fmt):
+    if hasattr(value, 'strftime'):
+        return value.strftime(DATETIME_FORMAT)
+    if isinstance(value, list) and fmt == 'csv':
+        return ','.join(value)
+    return value
+
+
+@data_cli.command('export')
+@click.argument('table', type=click.Choice(sorted(TABLES)))
+@click.option('-o', '--output', type=click.File('w', encoding='utf-8'), default='-',
+              help='Destination file, standard output by default.')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']),
+              help='Output format, guessed from the file extension by default.')
+@click.option('--batch-size', default=1000, show_default=True)
+def export_command(table, output, fmt, batch_size):
+    """Stream a table out as CSV or JSONL."""
+    model_table = TABLES[table][0].__table__
+    fmt = fmt or ('jsonl' if getattr(output, 'name', '').endswith(('.jsonl', '.json')) else 'csv')
+    columns = [column.name for column in model_table.columns]
+    result = db.session.connection(execution_options={'stream_results': True}). \
+        execute(model_table.select().order_by(model_table.c.id))
+
+    writer = csv.writer(output) if fmt == 'csv' else None
+    if writer:
+        writer.writerow(columns)
+    exported = 0
+    started = time.perf_counter()
+    while True:
+        batch = result.fetchmany(batch_size)
+        if not batch:
+            break
+        for row in batch:
+            values = [_export_value(row[column], fmt) for column in columns]
+            if writer:
+                writer.writerow(values)
+            else:
+                output.write(json.dumps(dict(zip(columns, values))) + '\n')
+        exported += len(batch)
+    result.close()
+
+    elapsed = time.perf_counter() - started
+    click.echo(f'exported {exported} {table} in {elapsed:.1f}s', err=True)
+
+
+def init_app(app):
+    app.cli.add_command(data_cli)
@@ -0,0 +1,212 @@
+# ----------------------------------------------------------------------------#
+# Rendered page cache for the read-heavy listing pages.
+#
+# Pages are stored under a key that embeds the versions of the tables they are
+# built from ('venues', 'artists', 'shows'), so a write to any of them makes
+# every dependent page miss on its next request; stale entries simply age out
+# of the LRU or expire with the TTL. The HTTP validators in http_cache.py are
+# built from the same versions.
+#
+# With the shared Redis backend the versions are generations kept in Redis:
+# write handlers and CLI commands call invalidate() with the tables they
+# changed, which sets each table's generation to the current time in
+# nanoseconds, so a 304 or a cache hit costs no SQL. Tables not invalidated
+# since the backend was created fall back to that time, so a restarted worker
+# never reuses a generation of its previous run.
+#
+# The in-process LRU cannot hear of writes made by other workers or by CLI
+# processes, so there the versions are read from the tables themselves: the
+# newest updated_at of each (an index lookup), and the row count of venues and
+# artists, which max(updated_at) misses deletes of. That is one statement per
+# request, on the primary. Shows are only deleted by `flask archive shows`,
+# which moves past shows; the pages listing those split shows at the current
+# time, and http_cache.py renews their validators every PAGE_CACHE_TTL anyway.
+# ----------------------------------------------------------------------------#
+
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+from datetime import datetime
+from threading import Lock
+from flask import current_app, g, jsonify, request, session
+from sqlalchemy import func, select
+
+from models import db, Venue, Artist, Show
+import replicas
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+# tables pages are built from, and those the app deletes rows from
+MODELS = {'venues': Venue, 'artists': Artist, 'shows': Show}
+COUNTED = ('venues', 'artists')
+
+
+class LRUCache:
+    # seen by this process only, so versions() reads the tables instead
+    shared = False
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisCache:
+    shared = True
+
+    def __init__(self, url):
+        if redis is None:
+            raise RuntimeError('CACHE_REDIS_URL is set but the redis package is not installed')
+        self._client = redis.Redis.from_url(url)
+        self.epoch = time.time_ns()
+
+    def get(self, key):
+        value = self._client.get(key)
+        return None if value is None else value.decode('utf-8')
+
+    def set(self, key, value, ttl):
+        self._client.setex(key, ttl, value)
+
+    def get_counters(self, keys):
+        return [self.epoch if value is None else int(value) for value in self._client.mget(keys)]
+
+    def set_counter(self, key, value):
+        self._client.set(key, value)
+
+    def __len__(self):
+        return self._client.dbsize()
+
+
+_backend = None
+# whether cached_page() stores pages; versions are available either way
+_pages_enabled = False
+stats = Counter()
+
+
+def _generation_key(table):
+    return 'fyyur:generation:' + table
+
+
+def _write_stamps(tables):
+    # newest updated_at of every table, and the row count of those rows are deleted from
+    columns = []
+    for table in tables:
+        model = MODELS[table]
+        columns.append(select([func.max(model.updated_at)]).as_scalar())
+        if table in COUNTED:
+            columns.append(select([func.count(model.id)]).as_scalar())
+    # on the primary, whose writes avoid_lag() compares with the replicas' lag
+    return list(db.session.execute(select(columns), bind=db.get_engine()).first())
+
+
+def versions(tables):
+    # (versions, modified): what pages built from the tables are stored and
+    # validated under, and the unix time of the newest write to them; None
+    # without a backend. Read once per request.
+    if _backend is None:
+        return None
+    read = g.setdefault('table_versions', {})
+    if tables not in read:
+        if _backend.shared:
+            generations = _backend.get_counters([_generation_key(table) for table in tables])
+            read[tables] = generations, max(generations) / 10 ** 9
+        else:
+            stamps = _write_stamps(tables)
+            newest = max((stamp for stamp in stamps if isinstance(stamp, datetime)), default=datetime(1970, 1, 1))
+            read[tables] = stamps, (newest - datetime(1970, 1, 1)).total_seconds()
+    return read[tables]
+
+
+def cached_page(*tables):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # pending flash messages are rendered into the page, so those requests bypass the cache
+            if _backend is None or not _pages_enabled or request.method != 'GET' or '_flashes' in session:
+                return view(*args, **kwargs)
+
+            table_versions, modified = versions(tables)
+            # pages are stored under the new versions right after a write, so
+            # they are rendered from the primary until every replica has it
+            replicas.avoid_lag(modified)
+            key = 'fyyur:page:{}:{}:{}'.format(request.endpoint, request.full_path,
+                                               ':'.join(str(version) for version in table_versions))
+            page = _backend.get(key)
+            if page is not None:
+                stats[request.endpoint + '.hits'] += 1
+                return page
+
+            stats[request.endpoint + '.misses'] += 1
+            page = view(*args, **kwargs)
+            if isinstance(page, str):
+                _backend.set(key, page, current_app.config['PAGE_CACHE_TTL'])
+            return page
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def pages_enabled(enabled):
+    # turns storing and serving pages on or off for a while, e.g. for a benchmark
+    global _pages_enabled
+    saved, _pages_enabled = _pages_enabled, enabled and _pages_enabled
+    try:
+        yield
+    finally:
+        _pages_enabled = saved
+
+
+def invalidate(*tables):
+    # moves the shared generations; the process-local cache follows the tables on its own
+    if _backend is None:
+        return
+    generation = time.time_ns()
+    for table in tables:
+        if _backend.shared:
+            _backend.set_counter(_generation_key(table), generation)
+        stats[table + '.invalidations'] += 1
+
+
+def cache_stats():
+    return jsonify({
+        "backend": type(_backend).__name__ if _backend is not None else None,
+        "entries": len(_backend) if _backend is not None and _pages_enabled else 0,
+        "counters": dict(stats)
+    })
+
+
+def init_app(app):
+    global _backend, _pages_enabled
+    _pages_enabled = app.config.get('PAGE_CACHE_ENABLED', True)
+    if app.config.get('CACHE_REDIS_URL'):
+        _backend = RedisCache(app.config['CACHE_REDIS_URL'])
+    else:
+        _backend = LRUCache(app.config.get('PAGE_CACHE_MAX_ENTRIES', 512))
+    app.add_url_rule('/cache/stats', 'cache_stats', cache_stats)
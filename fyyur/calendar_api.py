@@ -0,0 +1,195 @@
+# ----------------------------------------------------------------------------#
+# Show calendar API.
+#
+# A small ASGI service next to the Flask app for calendar widgets, which ask
+# for the shows of several venues or artists between two dates:
+#
+#   GET /api/calendar?venue_id=1&venue_id=2&from=2026-11-01&to=2026-12-01
+#
+# Every venue_id or artist_id is its own lookup; the lookups run concurrently
+# on a pool of asyncpg connections and each streams its rows through a cursor
+# into one NDJSON response, one show per line, as soon as they arrive. An id
+# that does not exist gets a single {"venue_id": 7, "error": "not found"} line.
+#
+# SQLAlchemy 1.3 has no asyncio support, so the queries are built from the
+# tables in models.py with SQLAlchemy Core, compiled once for PostgreSQL and
+# run with asyncpg directly. Serve it with an ASGI server, e.g.:
+#   gunicorn -k uvicorn.workers.UvicornWorker --workers 2 'calendar_api:create_app()'
+# ----------------------------------------------------------------------------#
+
+import asyncio
+import importlib
+import json
+import logging
+import re
+from datetime import datetime
+from urllib.parse import parse_qs
+import asyncpg
+from sqlalchemy import and_, bindparam, select
+from sqlalchemy.dialects import postgresql
+
+from models import Venue, Artist, Show
+
+logger = logging.getLogger(__name__)
+
+# query parameter -> (looked up model, its show column, the other side of its shows, that side's show column)
+LOOKUPS = {
+    'venue_id': (Venue, Show.venue_id, Artist, Show.artist_id),
+    'artist_id': (Artist, Show.artist_id, Venue, Show.venue_id),
+}
+
+# lines buffered between the lookups and a slow client
+QUEUE_SIZE = 1000
+
+
+def _lookup_statement(owner, owner_column, other, other_column):
+    window = and_(owner_column == owner.id,
+                  Show.start_time >= bindparam('start'),
+                  Show.start_time < bindparam('end'))
+    # the owner row always comes back, so an owner without shows in the window
+    # is one row of NULL shows and an unknown owner is no rows at all
+    statement = select([Show.id.label('show_id'), Show.start_time,
+                        Venue.id.label('venue_id'), Venue.name.label('venue_name'),
+                        Venue.image_link.label('venue_image_link'),
+                        Artist.id.label('artist_id'), Artist.name.label('artist_name'),
+                        Artist.image_link.label('artist_image_link')]). \
+        select_from(owner.__table__.outerjoin(Show.__table__, window).
+                    outerjoin(other.__table__, other.id == other_column)). \
+        where(owner.id == bindparam('owner_id')). \
+        order_by(Show.start_time, Show.id)
+
+    compiled = statement.compile(dialect=postgresql.dialect(paramstyle='format'))
+    # asyncpg takes $1, $2, ... placeholders
+    numbers = iter(range(1, len(compiled.positiontup) + 1))
+    sql = re.sub(r'%s', lambda match: f'${next(numbers)}', str(compiled))
+    return sql, compiled.positiontup
+
+
+STATEMENTS = {key: _lookup_statement(*lookup) for key, lookup in LOOKUPS.items()}
+
+
+class BadRequest(Exception):
+    pass
+
+
+def _parse_time(args, name):
+    try:
+        return datetime.fromisoformat(args[name][0])
+    except KeyError:
+        raise BadRequest(f'{name} is required')
+    except ValueError:
+        raise BadRequest(f'{name} must be an ISO 8601 date or time')
+
+
+def parse_query(query_string, config):
+    args = parse_qs(query_string.decode('latin-1'))
+    try:
+        lookups = [(key, int(value)) for key in LOOKUPS for value in args.get(key, ())]
+    except ValueError:
+        raise BadRequest('venue_id and artist_id must be integers')
+    if not lookups:
+        raise BadRequest('give at least one venue_id or artist_id')
+    if len(lookups) > config.CALENDAR_MAX_LOOKUPS:
+        raise BadRequest(f'at most {config.CALENDAR_MAX_LOOKUPS} venues and artists per request')
+
+    start, end = _parse_time(args, 'from'), _parse_time(args, 'to')
+    if end <= start:
+        raise BadRequest('to must be after from')
+    if (end - start).days > config.CALENDAR_MAX_DAYS:
+        raise BadRequest(f'at most {config.CALENDAR_MAX_DAYS} days per request')
+    return list(dict.fromkeys(lookups)), start, end
+
+
+def _line(record):
+    return (json.dumps(record, default=lambda value: value.isoformat()) + '\n').encode('utf-8')
+
+
+async def _lookup(pool, queue, key, owner_id, start, end):
+    sql, positions = STATEMENTS[key]
+    params = {'owner_id': owner_id, 'start': start, 'end': end}
+    found = False
+    try:
+        async with pool.acquire() as connection, connection.transaction():
+            async for row in connection.cursor(sql, *[params[name] for name in positions]):
+                found = True
+                if row['show_id'] is not None:
+                    await queue.put(_line(dict(row)))
+        if not found:
+            await queue.put(_line({key: owner_id, 'error': 'not found'}))
+    except (asyncpg.PostgresError, OSError):
+        logger.exception(f'calendar lookup of {key}={owner_id} failed')
+        await queue.put(_line({key: owner_id, 'error': 'lookup failed'}))
+    finally:
+        await queue.put(None)
+
+
+async def _send_json(send, status, body):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'application/json')]})
+    await send({'type': 'http.response.body', 'body': json.dumps(body).encode('utf-8')})
+
+
+def create_app(config_object='config'):
+    config = importlib.import_module(config_object)
+    pool = None
+    pool_lock = asyncio.Lock()
+
+    async def get_pool():
+        nonlocal pool
+        async with pool_lock:
+            if pool is None:
+                # asyncpg takes plain postgresql:// URLs, without a +driver suffix
+                dsn = re.sub(r'^postgres(ql)?(\+\w+)?://', 'postgresql://', config.CALENDAR_DATABASE_URL)
+                pool = await asyncpg.create_pool(dsn, min_size=1, max_size=config.CALENDAR_POOL_SIZE)
+        return pool
+
+    async def lifespan(receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await get_pool()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if pool is not None:
+                    await pool.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def calendar(scope, receive, send):
+        try:
+            lookups, start, end = parse_query(scope['query_string'], config)
+        except BadRequest as error:
+            return await _send_json(send, 400, {'error': str(error)})
+
+        connections = await get_pool()
+        queue = asyncio.Queue(QUEUE_SIZE)
+        tasks = [asyncio.ensure_future(_lookup(connections, queue, key, owner_id, start, end))
+                 for key, owner_id in lookups]
+        try:
+            await send({'type': 'http.response.start', 'status': 200,
+                        'headers': [(b'content-type', b'application/x-ndjson')]})
+            running = len(tasks)
+            while running:
+                line = await queue.get()
+                if line is None:
+                    running -= 1
+                else:
+                    await send({'type': 'http.response.body', 'body': line, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            # a client that went away leaves lookups behind
+            for task in tasks:
+                task.cancel()
+
+    async def app(scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await lifespan(receive, send)
+        if scope['type'] != 'http':
+            return
+        if scope['path'] != '/api/calendar':
+            return await _send_json(send, 404, {'error': 'not found'})
+        if scope['method'] not in ('GET', 'HEAD'):
+            return await _send_json(send, 405, {'error': 'method not allowed'})
+        return await calendar(scope, receive, send)
+
+    return app
@@ -1,10 +1,11 @@
 import os
-SECRET_KEY = os.urandom(32)
+# Must be the same for every worker process, so it comes from the environment.
+SECRET_KEY = os.environ.get('SECRET_KEY')
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
 
 # Enable debug mode.
-DEBUG = True
+DEBUG = os.environ.get('FLASK_DEBUG', '1') == '1'
 
 dialect = 'postgresql'
 username = ''
@@ -13,4 +14,112 @@ host = 'localhost'
 port = '5432'
 database = 'fyyur'
 SQLALCHEMY_TRACK_MODIFICATIONS = False
-SQLALCHEMY_DATABASE_URI = f'{dialect}://{username}:{password}@{host}:{port}/{database}'
+SQLALCHEMY_DATABASE_URI = os.environ.get(
+    'DATABASE_URL', f'{dialect}://{username}:{password}@{host}:{port}/{database}')
+
+# Connection pool of each worker process. Size it so that
+# workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) stays below Postgres' max_connections.
+SQLALCHEMY_ENGINE_OPTIONS = {}
+if SQLALCHEMY_DATABASE_URI.startswith('postgresql'):
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        # seconds to wait for a free connection before giving up
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        # replace connections older than this, and test each one on checkout,
+        # so a failover does not leave stale connections in the pool
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', '1') == '1',
+        # multi-row INSERT ... VALUES for executemany, so batch inserts are not a round trip per row
+        'executemany_mode': 'values',
+    }
+    # per-statement limit in milliseconds, 0 disables it
+    statement_timeout = int(os.environ.get('DB_STATEMENT_TIMEOUT', 0))
+    if statement_timeout:
+        SQLALCHEMY_ENGINE_OPTIONS['connect_args'] = {'options': f'-c statement_timeout={statement_timeout}'}
+
+# Database and connections per worker of the async show calendar API (calendar_api.py)
+CALENDAR_DATABASE_URL = os.environ.get('CALENDAR_DATABASE_URL', SQLALCHEMY_DATABASE_URI)
+CALENDAR_POOL_SIZE = int(os.environ.get('CALENDAR_POOL_SIZE', 10))
+# most venues and artists, and days, one calendar request may ask for
+CALENDAR_MAX_LOOKUPS = 50
+CALENDAR_MAX_DAYS = 366
+
+# Read replicas for the GET pages, comma separated, e.g.
+# DATABASE_REPLICA_URLS=postgresql://replica1/fyyur,postgresql://replica2/fyyur
+SQLALCHEMY_BINDS = {f'replica_{number}': url for number, url in
+                    enumerate(filter(None, os.environ.get('DATABASE_REPLICA_URLS', '').split(',')))}
+REPLICA_BINDS = list(SQLALCHEMY_BINDS)
+# seconds between replica health checks, and the replay lag that takes a replica out of rotation
+REPLICA_CHECK_INTERVAL = int(os.environ.get('REPLICA_CHECK_INTERVAL', 5))
+REPLICA_MAX_LAG = int(os.environ.get('REPLICA_MAX_LAG', 10))
+# seconds a client reads from the primary after one of its writes
+READ_YOUR_WRITES_SECONDS = 10
+
+# Number of city/state groups listed per page on /venues
+VENUE_AREAS_PER_PAGE = 20
+
+# Number of results per page for the venue, artist and show searches
+SEARCH_RESULTS_PER_PAGE = 20
+# Upcoming show times previewed for each venue and artist found by the show search
+SEARCH_SHOW_PREVIEWS = 5
+
+# Most shows accepted by one POST /artists/<id>/shows/batch
+SHOW_BATCH_MAX_ROWS = 500
+
+# `flask archive shows` moves shows that started more than this many days ago to shows_archive
+SHOW_ARCHIVE_AFTER_DAYS = 365
+
+# Rows per page of the /artists and /shows listings and their JSON API, and the
+# largest page a client may ask for with ?limit=
+LISTING_PAGE_SIZE = 50
+LISTING_MAX_PAGE_SIZE = 200
+
+# Cache-Control of the read pages by endpoint. The HTML pages send ETag and
+# Last-Modified, so `no-cache` lets browsers and CDNs keep them and revalidate
+# with a cheap 304; JSON API pages may also be reused for a minute unchecked.
+HTTP_CACHE_CONTROL = {
+    'main.index': 'public, no-cache',
+    'main.venues': 'public, no-cache',
+    'main.show_venue': 'public, no-cache',
+    'main.artists': 'public, no-cache',
+    'main.show_artist': 'public, no-cache',
+    'main.shows': 'public, no-cache',
+    'main.api_venues': 'public, max-age=60',
+    'main.api_artists': 'public, max-age=60',
+    'main.api_shows': 'public, max-age=60',
+}
+
+# Serve the built static bundles (`flask assets build`) instead of the
+# separate source files; development keeps the sources for easy debugging
+ASSETS_BUNDLED = not DEBUG
+
+# Full /venues, /artists and /shows listings streamed with ?stream=1: rows are
+# read STREAM_BATCH_SIZE at a time and the page is sent in chunks of about
+# STREAM_BUFFER_SIZE characters
+STREAMING_ENABLED = True
+STREAM_BATCH_SIZE = 500
+STREAM_BUFFER_SIZE = 16384
+
+# How a show's artist and venue are loaded on list and detail pages: 'joined', 'selectin' or 'select' (lazy)
+SHOW_LOADING_STRATEGY = 'joined'
+
+# Upcoming shows, and past shows per page, listed on the venue and artist pages
+DETAIL_SHOWS_PER_PAGE = 24
+
+# Rendered page cache for the home, venues and shows pages. Set CACHE_REDIS_URL
+# (requires the redis package) to share it between worker processes; then the
+# page keys and HTTP validators come from generations in Redis instead of one
+# max(updated_at) statement per request. Either way with pages off as well.
+PAGE_CACHE_ENABLED = True
+PAGE_CACHE_TTL = 60
+PAGE_CACHE_MAX_ENTRIES = 512
+CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL')
+
+# Instrumentation. Statements slower than SLOW_QUERY_MS are logged, as are
+# requests that repeat one statement more than N_PLUS_ONE_THRESHOLD times.
+# With PROFILER_ENABLED, ?profile=1 writes a cProfile dump to PROFILE_DIR.
+SLOW_QUERY_MS = int(os.environ.get('SLOW_QUERY_MS', 200))
+N_PLUS_ONE_THRESHOLD = 10
+PROFILER_ENABLED = os.environ.get('PROFILER_ENABLED') == '1'
+PROFILE_DIR = os.path.join(basedir, 'profiles')
@@ -0,0 +1,136 @@
+# ----------------------------------------------------------------------------#
+# Denormalized upcoming show counters.
+#
+# Venues and artists carry upcoming_shows_count and next_show_time so the
+# listings read a column instead of counting shows. Every handler that writes
+# shows calls refresh() with the venues and artists it touched, inside its own
+# transaction; refresh() recomputes their counters with one UPDATE per table,
+# so a lost increment can never leave a counter permanently wrong. On
+# PostgreSQL it first locks those rows in a statement of its own: a writer that
+# has to wait for another one's lock then counts with a snapshot taken after the
+# other transaction committed its show, where an UPDATE that waited on the lock
+# itself would still count with the snapshot it started with.
+#
+# Shows also move from upcoming to past as time passes. `flask counters roll`,
+# run every few minutes from cron, recomputes the rows whose next show has
+# started, which are exactly the rows time has changed. Venue counters also
+# feed the area directory, which refresh() keeps in step. `flask counters check`
+# recomputes every counter in bulk and reports (or with --fix, repairs) drift.
+# ----------------------------------------------------------------------------#
+
+from datetime import datetime
+import click
+from flask.cli import AppGroup
+from sqlalchemy import and_, func, or_, select, true
+
+from models import db, Venue, Artist, Show
+import cache
+import directory
+
+OWNER_COLUMNS = {
+    Venue: Show.venue_id,
+    Artist: Show.artist_id,
+}
+
+counters_cli = AppGroup('counters', help='Maintain the upcoming show counters of venues and artists.')
+
+
+def _lock(table, condition):
+    # held until the transaction ends; in id order, so writers locking several rows cannot deadlock
+    if db.engine.dialect.name != 'postgresql':
+        return
+    db.session.execute(select([table.c.id]).where(condition).order_by(table.c.id).with_for_update())
+
+
+def _refresh(model, condition, now):
+    table = model.__table__
+    _lock(table, condition)
+    upcoming = and_(OWNER_COLUMNS[model] == table.c.id, Show.start_time > now)
+    return db.session.execute(table.update().where(condition).values(
+        upcoming_shows_count=select([func.count(Show.id)]).where(upcoming).as_scalar(),
+        next_show_time=select([func.min(Show.start_time)]).where(upcoming).as_scalar()
+    )).rowcount
+
+
+def refresh(model, ids, now=None):
+    ids = {row_id for row_id in ids if row_id is not None}
+    if not ids:
+        return 0
+    refreshed = _refresh(model, model.__table__.c.id.in_(ids), now or datetime.now())
+    if model is Venue:
+        directory.refresh_venues(ids)
+    return refreshed
+
+
+def roll(now=None):
+    # only rows whose next show has started can have changed since the last roll
+    now = now or datetime.now()
+    rolled = 0
+    for model in OWNER_COLUMNS:
+        started = [row_id for row_id, in db.session.query(model.id).filter(model.next_show_time <= now)]
+        rolled += refresh(model, started, now)
+    return rolled
+
+
+def recompute(now=None):
+    now = now or datetime.now()
+    refreshed = sum(_refresh(model, true(), now) for model in OWNER_COLUMNS)
+    directory.rebuild()
+    return refreshed
+
+
+def drift(model, now=None):
+    # rows whose stored counters differ from a fresh grouped count
+    now = now or datetime.now()
+    owner_column = OWNER_COLUMNS[model]
+    actual = db.session.query(owner_column.label('owner_id'),
+                              func.count(Show.id).label('total'),
+                              func.min(Show.start_time).label('next_time')). \
+        filter(Show.start_time > now).group_by(owner_column).subquery()
+    total = func.coalesce(actual.c.total, 0)
+    return db.session.query(model.id, model.upcoming_shows_count, total.label('actual_count'),
+                            model.next_show_time, actual.c.next_time.label('actual_next_show_time')). \
+        outerjoin(actual, actual.c.owner_id == model.id). \
+        filter(or_(model.upcoming_shows_count != total,
+                   model.next_show_time.is_distinct_from(actual.c.next_time))). \
+        order_by(model.id).all()
+
+
+@counters_cli.command('roll')
+def roll_command():
+    """Move shows that have started from the upcoming to the past counters."""
+    rolled = roll()
+    db.session.commit()
+    if rolled:
+        cache.invalidate('venues', 'artists')
+    click.echo(f'refreshed {rolled} venues and artists')
+
+
+@counters_cli.command('check')
+@click.option('--fix', is_flag=True, help='Recompute the counters that drifted.')
+def check_command(fix):
+    """Recompute every counter and report the ones that drifted."""
+    now = datetime.now()
+    drifted = 0
+    for model in OWNER_COLUMNS:
+        rows = drift(model, now)
+        drifted += len(rows)
+        for row in rows:
+            click.echo(f'{model.__tablename__} {row.id}: {row.upcoming_shows_count} upcoming shows, '
+                       f'actually {row.actual_count}; next show {row.next_show_time}, '
+                       f'actually {row.actual_next_show_time}')
+        if fix and rows:
+            refresh(model, [row.id for row in rows], now)
+
+    if fix and drifted:
+        db.session.commit()
+        cache.invalidate('venues', 'artists')
+        click.echo(f'fixed {drifted} drifted counters')
+    elif drifted:
+        raise click.ClickException(f'{drifted} venues and artists have drifted counters')
+    else:
+        click.echo('all counters are consistent')
+
+
+def init_app(app):
+    app.cli.add_command(counters_cli)
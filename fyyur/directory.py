@@ -0,0 +1,126 @@
+# ----------------------------------------------------------------------------#
+# Area directory behind the /venues listing.
+#
+# area_directory holds one row per (state, city) with the area's venues and
+# their upcoming show counts already grouped, so a page of the listing is one
+# primary key range scan. Writers keep it current incrementally: whatever
+# changes a venue, or a venue's upcoming show count, calls refresh_areas() or
+# refresh_venues() in the same transaction, which regroups only the areas
+# involved. On PostgreSQL a writer holds a transaction-level advisory lock per
+# area while it regroups, so two writers in one area take turns and the second
+# regroups with the first one's venue committed, instead of both writing a list
+# that misses the other's venue. `flask directory refresh` rebuilds every area
+# in one transaction; readers keep seeing the previous rows until it commits.
+# Writers also hold a shared lock on the whole directory, which the rebuild
+# takes exclusively before it reads the venues, so it neither overwrites a
+# writer's regrouped area with rows read before that writer committed nor
+# runs alongside one; readers take no locks.
+# ----------------------------------------------------------------------------#
+
+from itertools import groupby
+import click
+from flask.cli import AppGroup
+from sqlalchemy import and_, or_, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from models import db, Venue, AreaDirectory
+import cache
+
+# advisory lock key of the whole directory, and prefix of the per-area keys
+LOCK_KEY = 'area_directory'
+
+directory_cli = AppGroup('directory', help='Maintain the area directory of the venues listing.')
+
+
+def _grouped(areas=None):
+    query = db.session.query(Venue.id, Venue.name, Venue.state, Venue.city, Venue.upcoming_shows_count)
+    if areas is not None:
+        query = query.filter(or_(*[and_(Venue.state == state, Venue.city == city) for state, city in areas]))
+    rows = query.order_by(Venue.state, Venue.city, Venue.name, Venue.id)
+    for (state, city), area_venues in groupby(rows, key=lambda row: (row.state, row.city)):
+        venues = [{
+            "id": venue.id,
+            "name": venue.name,
+            "num_upcoming_shows": venue.upcoming_shows_count
+        } for venue in area_venues]
+        yield {
+            "state": state,
+            "city": city,
+            "venues": venues,
+            "venue_count": len(venues),
+            "upcoming_shows_count": sum(venue["num_upcoming_shows"] for venue in venues)
+        }
+
+
+def _write(rows, stale_areas):
+    table = AreaDirectory.__table__
+    if stale_areas:
+        db.session.execute(table.delete().where(or_(*[and_(table.c.state == state, table.c.city == city)
+                                                      for state, city in stale_areas])))
+    if not rows:
+        return
+    if db.engine.dialect.name == 'postgresql':
+        # an upsert, so two writers regrouping the same new area do not collide
+        statement = pg_insert(table)
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=[table.c.state, table.c.city],
+            set_={column: statement.excluded[column] for column in ('venues', 'venue_count', 'upcoming_shows_count')}
+        ), rows)
+    else:
+        db.session.execute(table.delete().where(or_(*[and_(table.c.state == row["state"], table.c.city == row["city"])
+                                                      for row in rows])))
+        db.session.execute(table.insert(), rows)
+
+
+def _lock(areas):
+    # held until the transaction ends: the directory shared, then every area in one
+    # statement, in sorted order, so writers locking several areas cannot deadlock
+    if db.engine.dialect.name != 'postgresql':
+        return
+    db.session.execute(text('SELECT pg_advisory_xact_lock_shared(hashtext(:key))'), {'key': LOCK_KEY})
+    db.session.execute(text('SELECT pg_advisory_xact_lock(hashtext(area)) FROM unnest(CAST(:areas AS text[])) '
+                            'AS area ORDER BY area'),
+                       {'areas': [f'{LOCK_KEY}:{state}:{city}' for state, city in areas]})
+
+
+def _lock_all():
+    # waits for the writers regrouping areas to commit, and keeps new ones out until the transaction ends
+    if db.engine.dialect.name == 'postgresql':
+        db.session.execute(text('SELECT pg_advisory_xact_lock(hashtext(:key))'), {'key': LOCK_KEY})
+
+
+def refresh_areas(areas):
+    areas = {(state, city) for state, city in areas if state is not None and city is not None}
+    if not areas:
+        return
+    _lock(areas)
+    rows = list(_grouped(areas))
+    # areas whose last venue moved away or was deleted
+    _write(rows, areas - {(row["state"], row["city"]) for row in rows})
+
+
+def refresh_venues(ids):
+    ids = {venue_id for venue_id in ids if venue_id is not None}
+    if ids:
+        refresh_areas(db.session.query(Venue.state, Venue.city).filter(Venue.id.in_(ids)).distinct().all())
+
+
+def rebuild():
+    _lock_all()
+    rows = list(_grouped())
+    current = {(state, city) for state, city in db.session.query(AreaDirectory.state, AreaDirectory.city)}
+    _write(rows, current - {(row["state"], row["city"]) for row in rows})
+    return len(rows)
+
+
+@directory_cli.command('refresh')
+def refresh_command():
+    """Regroup every area of the venues listing."""
+    areas = rebuild()
+    db.session.commit()
+    cache.invalidate('venues')
+    click.echo(f'refreshed {areas} areas')
+
+
+def init_app(app):
+    app.cli.add_command(directory_cli)
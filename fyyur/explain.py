@@ -0,0 +1,95 @@
+# ----------------------------------------------------------------------------#
+# EXPLAIN check for the hot views.
+#
+# `flask explain-hot-views` renders each hot page through the test client,
+# captures the SELECT statements it issues and runs EXPLAIN on every one of
+# them. The command fails when a plan reads one of the indexed tables with a
+# sequential scan. Sequential scans are disabled for the EXPLAIN session by
+# default, because on a small development database the planner prefers them
+# even when a suitable index exists.
+# ----------------------------------------------------------------------------#
+
+import re
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import event, func
+
+from models import db, Venue, Artist
+
+HOT_VIEWS = [
+    '/',
+    '/venues',
+    '/shows',
+    '/venues/{venue_id}',
+    '/artists/{artist_id}',
+]
+
+INDEXED_TABLES = ('shows', 'venues', 'artists')
+
+_SEQ_SCAN = re.compile(r'Seq Scan on (\w+)')
+
+
+def _capture_selects(path):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        response = current_app.test_client().get(path)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+    if response.status_code != 200:
+        raise click.ClickException(f'GET {path} answered {response.status_code}')
+    return statements
+
+
+def _explain(cursor, statement, parameters):
+    cursor.execute('EXPLAIN ' + statement, parameters)
+    return '\n'.join(row[0] for row in cursor.fetchall())
+
+
+@click.command('explain-hot-views')
+@click.option('--allow-seqscan', is_flag=True, help='Explain with the planner settings of the server.')
+@with_appcontext
+def explain_hot_views_command(allow_seqscan):
+    """Fail if a hot view runs a query that does not use an index."""
+    if db.engine.dialect.name != 'postgresql':
+        raise click.ClickException('explain-hot-views needs a PostgreSQL database')
+
+    ids = {
+        'venue_id': db.session.query(func.min(Venue.id)).scalar(),
+        'artist_id': db.session.query(func.min(Artist.id)).scalar(),
+    }
+    if None in ids.values():
+        raise click.ClickException('add at least one venue and one artist before running the check')
+
+    failures = 0
+    raw = db.engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        if not allow_seqscan:
+            cursor.execute('SET enable_seqscan = off')
+        for view in HOT_VIEWS:
+            path = view.format(**ids)
+            for statement, parameters in _capture_selects(path):
+                plan = _explain(cursor, statement, parameters)
+                scanned = [table for table in _SEQ_SCAN.findall(plan) if table in INDEXED_TABLES]
+                if scanned:
+                    failures += 1
+                    click.echo(f'FAIL {path}: sequential scan on {", ".join(scanned)}')
+                    click.echo(f'{statement}\n{plan}\n')
+                else:
+                    click.echo(f'ok   {path}: {plan.splitlines()[0].strip()}')
+    finally:
+        raw.close()
+
+    if failures:
+        raise click.ClickException(f'{failures} hot queries do not use an index')
+
+
+def init_app(app):
+    app.cli.add_command(explain_hot_views_command)
@@ -3,13 +3,21 @@ from fabric.contrib.console import confirm
 
 # prepare for deployment
 
+BENCH_ENV = "FLASK_APP=app DATABASE_URL=sqlite:///bench.sqlite"
+
 
 def test():
+    with settings(warn_only=True):
+        result = local("python -m pytest -q", capture=True)
+    if result.failed and not confirm("Tests failed. Continue?"):
+        abort("Aborted at user request.")
     with settings(warn_only=True):
         result = local(
-            "python test_tasks.py -v && python test_users.py -v", capture=True
+            "{0} flask bench seed --reset && "
+            "{0} flask bench run -o bench-results.json --baseline bench-baseline.json".format(BENCH_ENV),
+            capture=True
         )
-    if result.failed and not confirm("Tests failed. Continue?"):
+    if result.failed and not confirm("Benchmark failed. Continue?"):
         abort("Aborted at user request.")
 
 
@@ -39,9 +47,7 @@ def heroku():
 
 
 def heroku_test():
-    local(
-        "heroku run python test_tasks.py -v && heroku run python test_users.py -v"
-    )
+    local("heroku run flask explain-hot-views")
 
 
 def deploy():
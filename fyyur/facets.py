@@ -0,0 +1,115 @@
+# ----------------------------------------------------------------------------#
+# Faceted browsing of venues and artists.
+#
+# Listings can be filtered by genre, state, city and the seeking flag, and come
+# with facet counts: for every value of every facet, how many of the filtered
+# venues or artists have it. On PostgreSQL the genre filter is an array
+# containment test (genres @> ARRAY[...]) served by the GIN index on genres,
+# and all facet counts come from one GROUPING SETS query over the filtered rows
+# with their genres unnested. Other databases (SQLite test runs) match genres
+# in the JSON text and count the facets in Python, still from a single query.
+# ----------------------------------------------------------------------------#
+
+from collections import Counter
+from flask import abort
+from sqlalchemy import cast, distinct, func
+from sqlalchemy.dialects.postgresql import ARRAY, array
+
+from forms import VenueForm, ArtistForm
+from models import db, Venue, Artist
+
+GENRES = {value for value, _ in ArtistForm.genres.kwargs['choices']}
+STATES = {value for value, _ in VenueForm.state.kwargs['choices']}
+
+SEEKING_COLUMNS = {
+    Venue: Venue.seeking_talent,
+    Artist: Artist.seeking_venue,
+}
+
+_FLAGS = {'1': True, 'true': True, 'yes': True, '0': False, 'false': False, 'no': False}
+
+
+def parse_filters(model, args):
+    # the recognised filters in `args`, aborting with 400 on a value that cannot match
+    seeking = SEEKING_COLUMNS[model].key
+    filters = {}
+    genres = args.getlist('genre')
+    if genres:
+        if not set(genres) <= GENRES:
+            abort(400, 'unknown genre')
+        filters['genre'] = genres
+    if args.get('state'):
+        if args['state'] not in STATES:
+            abort(400, 'unknown state')
+        filters['state'] = args['state']
+    if args.get('city'):
+        filters['city'] = args['city']
+    if args.get(seeking):
+        if args[seeking].lower() not in _FLAGS:
+            abort(400, f'{seeking} must be true or false')
+        filters[seeking] = _FLAGS[args[seeking].lower()]
+    return filters
+
+
+def apply_filters(query, model, filters):
+    for genre in filters.get('genre', ()):
+        if db.engine.dialect.name == 'postgresql':
+            # genres is varchar[]; a bare ARRAY[...] literal is text[], which @> does not take
+            query = query.filter(model.genres.op('@>')(cast(array([genre]), ARRAY(db.String))))
+        else:
+            # genres are stored as a JSON list here
+            query = query.filter(cast(model.genres, db.Text).like(f'%"{genre}"%'))
+    if 'state' in filters:
+        query = query.filter(model.state == filters['state'])
+    if 'city' in filters:
+        query = query.filter(model.city == filters['city'])
+    seeking = SEEKING_COLUMNS[model]
+    if seeking.key in filters:
+        query = query.filter(seeking.is_(filters[seeking.key]))
+    return query
+
+
+def _empty_facets(model):
+    return {'genre': {}, 'state': {}, 'city': {}, SEEKING_COLUMNS[model].key: {}}
+
+
+def facet_counts(model, filters):
+    seeking = SEEKING_COLUMNS[model]
+    facets = _empty_facets(model)
+
+    if db.engine.dialect.name != 'postgresql':
+        rows = apply_filters(db.session.query(model.genres, model.state, model.city, seeking), model, filters)
+        counters = {name: Counter() for name in facets}
+        for genres, state, city, flag in rows:
+            counters['genre'].update(set(genres or ()))
+            counters['state'][state] += 1
+            counters['city'][city] += 1
+            counters[seeking.key][bool(flag)] += 1
+        for name, counter in counters.items():
+            facets[name] = {str(value).lower() if isinstance(value, bool) else value: count
+                            for value, count in counter.most_common()}
+        return facets
+
+    # one row per (venue or artist, genre); every grouping set counts distinct ids
+    matches = apply_filters(db.session.query(model.id.label('id'),
+                                             func.unnest(model.genres).label('genre'),
+                                             model.state.label('state'),
+                                             model.city.label('city'),
+                                             func.coalesce(seeking, False).label('seeking')),
+                            model, filters).subquery()
+    columns = {'genre': matches.c.genre, 'state': matches.c.state, 'city': matches.c.city,
+               seeking.key: matches.c.seeking}
+    rows = db.session.query(*columns.values(),
+                            *[func.grouping(column) for column in columns.values()],
+                            func.count(distinct(matches.c.id))). \
+        group_by(func.grouping_sets(*columns.values())).all()
+
+    for row in rows:
+        values, grouped, count = row[:4], row[4:8], row[8]
+        # exactly one column is grouped in each row; grouping() is 0 for that one
+        position = grouped.index(0)
+        value = values[position]
+        facets[list(columns)[position]][str(value).lower() if isinstance(value, bool) else value] = count
+    for name in facets:
+        facets[name] = dict(sorted(facets[name].items(), key=lambda item: (-item[1], str(item[0]))))
+    return facets
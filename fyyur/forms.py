@@ -1,7 +1,7 @@
 from datetime import datetime
 from flask_wtf import FlaskForm
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField
-from wtforms.validators import DataRequired, URL, Length
+from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, HiddenField, IntegerField
+from wtforms.validators import DataRequired, URL, Length, NumberRange, Optional
 
 
 class ShowForm(FlaskForm):
@@ -16,6 +16,13 @@ class ShowForm(FlaskForm):
         validators=[DataRequired()],
         default=datetime.today()
     )
+    duration_minutes = IntegerField(
+        'duration_minutes',
+        validators=[Optional(), NumberRange(min=1, max=24 * 60)],
+        # a blank field books the default length
+        filters=[lambda minutes: 120 if minutes is None else minutes],
+        default=120
+    )
 
 
 class VenueForm(FlaskForm):
@@ -126,6 +133,10 @@ class VenueForm(FlaskForm):
     seeking_description = StringField(
         'seeking_description'
     )
+    # row version the edit form was rendered from, see edit_*_submission
+    version = HiddenField(
+        'version'
+    )
 
 
 class ArtistForm(FlaskForm):
@@ -233,3 +244,7 @@ class ArtistForm(FlaskForm):
     seeking_description = StringField(
         'seeking_description'
     )
+    # row version the edit form was rendered from, see edit_*_submission
+    version = HiddenField(
+        'version'
+    )
@@ -0,0 +1,118 @@
+# ----------------------------------------------------------------------------#
+# HTTP validators and Cache-Control for the read pages.
+#
+# A view decorated with @http_cache.conditional('venues', 'shows', ...) names
+# the tables it is built from, like cache.cached_page(). Its ETag hashes the
+# URL with the cache.versions() of those tables, which every write moves, and
+# Last-Modified is the time of the newest write. Those are the generations of
+# the shared cache backend, a lookup in Redis, or else one statement reading
+# max(updated_at) of the tables, so a request whose If-None-Match or
+# If-Modified-Since still matches gets a 304 without rendering; otherwise the
+# view runs (behind the page cache, where it has one) and the response carries
+# both headers.
+#
+# Every ETag also carries a digest of the templates and of the static asset
+# manifest the app was started with, so a deploy or `flask assets build` makes
+# browsers and CDNs fetch pages that link to the new bundles; Last-Modified is
+# never older than those files.
+#
+# Pages that split shows at the current time (upcoming and past shows) also
+# change as shows start, without any write. Their validators carry the current
+# PAGE_CACHE_TTL-long window of time as well, the staleness the page cache
+# already accepts for them.
+#
+# Cache-Control is set per endpoint from HTTP_CACHE_CONTROL. Pages rendered
+# with pending flash messages are personal and are never validated or cached.
+# ----------------------------------------------------------------------------#
+
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+from functools import wraps
+from flask import current_app, g, make_response, request, session
+
+import cache
+import replicas
+
+
+def _not_modified(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if request.if_modified_since and last_modified:
+        # HTTP dates have whole seconds
+        return last_modified.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None)
+    return False
+
+
+def conditional(*tables, clock=False):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or g.get('flashes_pending'):
+                return view(*args, **kwargs)
+            table_versions = cache.versions(tables)
+            if table_versions is None:
+                return view(*args, **kwargs)
+
+            versions, modified = table_versions
+            replicas.avoid_lag(modified)
+            release = current_app.extensions['http_cache']
+            versions = versions + [release["digest"]]
+            modified = max(int(modified), release["modified"])
+            if clock:
+                window = current_app.config['PAGE_CACHE_TTL']
+                versions = versions + [int(time.time()) // window]
+                modified = max(modified, int(time.time()) // window * window)
+            etag = hashlib.sha1(repr((request.full_path, versions)).encode('utf-8')).hexdigest()
+            last_modified = datetime.utcfromtimestamp(modified)
+            if _not_modified(etag, last_modified):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            return response
+        return wrapper
+    return decorator
+
+
+def _release(app):
+    # digest and newest modification time of the templates and the asset manifest
+    digest = hashlib.sha1(json.dumps(app.extensions.get('assets'), sort_keys=True).encode('utf-8'))
+    modified = 0
+    paths = [os.path.join(directory, name)
+             for directory, _, names in os.walk(os.path.join(app.root_path, app.template_folder))
+             for name in names]
+    manifest = app.extensions.get('assets_manifest')
+    for path in sorted(paths) + ([manifest] if manifest else []):
+        with open(path, 'rb') as source:
+            digest.update(source.read())
+        modified = max(modified, int(os.path.getmtime(path)))
+    return {"digest": digest.hexdigest(), "modified": modified}
+
+
+def _note_flashes():
+    g.flashes_pending = '_flashes' in session
+
+
+def _set_cache_control(response):
+    if request.method not in ('GET', 'HEAD') or response.status_code not in (200, 304):
+        return response
+    if g.get('flashes_pending'):
+        response.headers['Cache-Control'] = 'private, no-store'
+        return response
+    policy = current_app.config.get('HTTP_CACHE_CONTROL', {}).get(request.endpoint)
+    if policy:
+        response.headers['Cache-Control'] = policy
+    return response
+
+
+def init_app(app):
+    # after assets.init_app(), which loads the manifest
+    app.extensions['http_cache'] = _release(app)
+    app.before_request(_note_flashes)
+    app.after_request(_set_cache_control)
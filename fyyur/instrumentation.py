@@ -0,0 +1,224 @@
+# ----------------------------------------------------------------------------#
+# Request and SQL instrumentation.
+#
+# Every request is timed from before_request until its response is closed, so
+# streamed pages are measured in full; its statement count is the one
+# query_budget keeps. Every SQL statement is timed through engine events and
+# attributed to the endpoint that issued it. Statements slower
+# than SLOW_QUERY_MS are logged, and so is a request that repeats the same
+# statement more than N_PLUS_ONE_THRESHOLD times (the signature of a lazy load
+# in a loop). Aggregates, together with the page cache and connection pool
+# statistics, are served at /metrics in the Prometheus text format.
+#
+# With PROFILER_ENABLED set, adding ?profile=1 to a URL writes a cProfile dump
+# of that request to PROFILE_DIR.
+# ----------------------------------------------------------------------------#
+
+import cProfile
+import os
+import time
+from collections import Counter, defaultdict
+from threading import Lock
+from flask import Response, current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+import cache
+import pool_stats
+import query_budget
+import replicas
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = defaultdict(lambda: [0] * len(buckets))
+        self.sums = Counter()
+        self.totals = Counter()
+
+    def observe(self, labels, value):
+        counts = self.counts[labels]
+        for position, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[position] += 1
+        self.sums[labels] += value
+        self.totals[labels] += 1
+
+
+class RequestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        # how often each statement ran, for the N+1 check
+        self.statements = Counter()
+        self.sql_seconds = 0.0
+        self.profiler = None
+
+
+_lock = Lock()
+request_duration = Histogram(DURATION_BUCKETS)
+query_duration = Histogram(DURATION_BUCKETS)
+queries_per_request = Histogram(COUNT_BUCKETS)
+requests_total = Counter()
+slow_queries_total = Counter()
+n_plus_one_total = Counter()
+
+
+# ----------------------------------------------------------------------------#
+# SQL statements.
+# ----------------------------------------------------------------------------#
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info['query_started'] = time.perf_counter()
+
+
+def _execute_failed(context):
+    # a failed statement never reaches after_cursor_execute; its start time must
+    # not be taken for the next statement's
+    if context.connection is not None:
+        context.connection.info.pop('query_started', None)
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop('query_started', None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    endpoint = request.endpoint if has_request_context() else None
+    with _lock:
+        query_duration.observe((endpoint or 'none',), elapsed)
+
+    if has_request_context() and 'instrumentation' in g:
+        g.instrumentation.statements[statement] += 1
+        g.instrumentation.sql_seconds += elapsed
+
+    threshold = current_app.config.get('SLOW_QUERY_MS') if has_app_context() else None
+    if threshold is not None and elapsed * 1000 > threshold:
+        with _lock:
+            slow_queries_total[endpoint or 'none'] += 1
+        current_app.logger.warning('slow query (%.1f ms) in %s: %s', elapsed * 1000, endpoint, statement)
+
+
+# ----------------------------------------------------------------------------#
+# Requests.
+# ----------------------------------------------------------------------------#
+
+def _start_request():
+    g.instrumentation = RequestStats()
+    if current_app.config['PROFILER_ENABLED'] and request.args.get('profile') == '1':
+        g.instrumentation.profiler = cProfile.Profile()
+        g.instrumentation.profiler.enable()
+
+
+def _finish_request(stats, request_globals, endpoint, method, status, app):
+    elapsed = time.perf_counter() - stats.started
+    # the request context may be gone by the time a streamed response is closed
+    statement_count = query_budget.query_count(request_globals)
+    with _lock:
+        request_duration.observe((endpoint, method), elapsed)
+        queries_per_request.observe((endpoint,), statement_count)
+        requests_total[(endpoint, method, str(status))] += 1
+
+    repeated = [(count, statement) for statement, count in stats.statements.items()
+                if count > app.config['N_PLUS_ONE_THRESHOLD']]
+    if repeated:
+        with _lock:
+            n_plus_one_total[endpoint] += 1
+        count, statement = max(repeated)
+        app.logger.warning('possible N+1 in %s: statement ran %d times: %s', endpoint, count, statement)
+
+    if stats.profiler is not None:
+        stats.profiler.disable()
+        os.makedirs(app.config['PROFILE_DIR'], exist_ok=True)
+        stats.profiler.dump_stats(os.path.join(
+            app.config['PROFILE_DIR'], f'{endpoint}-{time.strftime("%Y%m%d-%H%M%S")}-{os.getpid()}.prof'))
+
+
+def _track_response(response):
+    if 'instrumentation' in g:
+        stats = g.instrumentation
+        endpoint = request.endpoint or 'unknown'
+        method = request.method
+        status = response.status_code
+        app = current_app._get_current_object()
+        request_globals = g._get_current_object()
+        # streamed bodies are still being produced here, so finish when the server closes the response
+        response.call_on_close(lambda: _finish_request(stats, request_globals, endpoint, method, status, app))
+    return response
+
+
+# ----------------------------------------------------------------------------#
+# Prometheus exposition.
+# ----------------------------------------------------------------------------#
+
+def _labels(names, values):
+    return ','.join(f'{name}="{str(value).replace(chr(34), chr(39))}"' for name, value in zip(names, values))
+
+
+def _histogram_lines(name, help_text, histogram, label_names):
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+    for labels, counts in sorted(histogram.counts.items()):
+        label_text = _labels(label_names, labels)
+        for bound, count in zip(histogram.buckets, counts):
+            lines.append(f'{name}_bucket{{{label_text},le="{bound}"}} {count}')
+        lines.append(f'{name}_bucket{{{label_text},le="+Inf"}} {histogram.totals[labels]}')
+        lines.append(f'{name}_sum{{{label_text}}} {histogram.sums[labels]}')
+        lines.append(f'{name}_count{{{label_text}}} {histogram.totals[labels]}')
+    return lines
+
+
+def _counter_lines(name, help_text, counter, label_names):
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+    for labels, value in sorted(counter.items()):
+        labels = labels if isinstance(labels, tuple) else (labels,)
+        lines.append(f'{name}{{{_labels(label_names, labels)}}} {value}')
+    return lines
+
+
+def metrics():
+    with _lock:
+        lines = []
+        lines += _counter_lines('fyyur_http_requests_total', 'Requests served.',
+                                requests_total, ('endpoint', 'method', 'status'))
+        lines += _histogram_lines('fyyur_http_request_duration_seconds', 'Time to serve a request.',
+                                  request_duration, ('endpoint', 'method'))
+        lines += _histogram_lines('fyyur_db_queries_per_request', 'SQL statements issued per request.',
+                                  queries_per_request, ('endpoint',))
+        lines += _histogram_lines('fyyur_db_query_duration_seconds', 'Time to execute a SQL statement.',
+                                  query_duration, ('endpoint',))
+        lines += _counter_lines('fyyur_db_slow_queries_total', 'Statements slower than SLOW_QUERY_MS.',
+                                slow_queries_total, ('endpoint',))
+        lines += _counter_lines('fyyur_db_n_plus_one_total', 'Requests that repeated one statement too often.',
+                                n_plus_one_total, ('endpoint',))
+
+    cache_events = Counter({tuple(key.rsplit('.', 1)): value for key, value in cache.stats.items()})
+    lines += _counter_lines('fyyur_page_cache_events_total', 'Page cache hits, misses and invalidations.',
+                            cache_events, ('key', 'event'))
+
+    lines += ['# HELP fyyur_db_pool Connection pool state.', '# TYPE fyyur_db_pool gauge']
+    for key, value in sorted(pool_stats.pool_status().items()):
+        if isinstance(value, (int, float)):
+            lines.append(f'fyyur_db_pool{{stat="{key}"}} {value}')
+
+    lines += ['# HELP fyyur_db_replica_healthy Whether a read replica is in rotation.',
+              '# TYPE fyyur_db_replica_healthy gauge']
+    for bind_key, status in sorted(replicas.replica_health().items()):
+        lines.append(f'fyyur_db_replica_healthy{{bind="{bind_key}"}} {int(bool(status and status["healthy"]))}')
+
+    return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+
+def init_app(app):
+    app.config.setdefault('SLOW_QUERY_MS', 200)
+    app.config.setdefault('N_PLUS_ONE_THRESHOLD', 10)
+    app.config.setdefault('PROFILER_ENABLED', False)
+    app.config.setdefault('PROFILE_DIR', os.path.join(app.root_path, 'profiles'))
+    if not event.contains(Engine, 'before_cursor_execute', _before_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_execute)
+        event.listen(Engine, 'handle_error', _execute_failed)
+    app.before_request(_start_request)
+    app.after_request(_track_response)
+    app.add_url_rule('/metrics', 'metrics', metrics)
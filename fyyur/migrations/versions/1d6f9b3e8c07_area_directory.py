@@ -0,0 +1,41 @@
+"""area directory summary table for the venues listing
+
+Revision ID: 1d6f9b3e8c07
+Revises: e8b3c5d17a42
+Create Date: 2026-10-18 13:58:27.331604
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1d6f9b3e8c07'
+down_revision = 'e8b3c5d17a42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('area_directory',
+                    sa.Column('state', sa.String(length=20), nullable=False),
+                    sa.Column('city', sa.String(length=120), nullable=False),
+                    sa.Column('venues', sa.JSON(), nullable=False),
+                    sa.Column('venue_count', sa.Integer(), nullable=False),
+                    sa.Column('upcoming_shows_count', sa.Integer(), nullable=False),
+                    sa.PrimaryKeyConstraint('state', 'city')
+                    )
+    # initial fill; from here on directory.refresh_areas() and `flask directory refresh` maintain it
+    op.execute("""
+        INSERT INTO area_directory (state, city, venues, venue_count, upcoming_shows_count)
+        SELECT state, city,
+               json_agg(json_build_object('id', id, 'name', name, 'num_upcoming_shows', upcoming_shows_count)
+                        ORDER BY name, id),
+               count(*), sum(upcoming_shows_count)
+        FROM venues
+        GROUP BY state, city
+    """)
+
+
+def downgrade():
+    op.drop_table('area_directory')
@@ -0,0 +1,36 @@
+"""trigram search indexes on venue and artist names
+
+Revision ID: 3f1c9a2b7d4e
+Revises: 78e462d41bf8
+Create Date: 2026-10-18 09:12:41.503118
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c9a2b7d4e'
+down_revision = '78e462d41bf8'
+branch_labels = None
+depends_on = None
+
+# Built CONCURRENTLY, outside the migration's transaction, so venues and
+# artists keep accepting writes while the GIN indexes are built.
+INDEXES = [
+    ('ix_venues_name_trgm', 'venues'),
+    ('ix_artists_name_trgm', 'artists'),
+]
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    with op.get_context().autocommit_block():
+        for name, table in INDEXES:
+            op.create_index(name, table, ['name'], unique=False, postgresql_using='gin',
+                            postgresql_ops={'name': 'gin_trgm_ops'}, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,37 @@
+"""shows_archive table for past shows, with a BRIN index on start_time
+
+Revision ID: 4e7b1c9d3a68
+Revises: 9c5d2a7e4f16
+Create Date: 2026-10-18 15:47:12.390554
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4e7b1c9d3a68'
+down_revision = '9c5d2a7e4f16'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # date windows over shows are served by ix_shows_start_time_id; the archive is
+    # append-only in start_time order, which is what BRIN is for
+    op.create_table('shows_archive',
+                    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+                    sa.Column('artist_id', sa.Integer(), nullable=False),
+                    sa.Column('venue_id', sa.Integer(), nullable=False),
+                    sa.Column('start_time', sa.DateTime(), nullable=False),
+                    sa.Column('updated_at', sa.DateTime(), nullable=False),
+                    sa.Column('archived_at', sa.DateTime(), nullable=False,
+                              server_default=sa.text("(now() AT TIME ZONE 'utc')")),
+                    sa.PrimaryKeyConstraint('id'))
+    op.create_index('ix_shows_archive_start_time', 'shows_archive', ['start_time'], unique=False,
+                    postgresql_using='brin')
+
+
+def downgrade():
+    op.drop_index('ix_shows_archive_start_time', table_name='shows_archive')
+    op.drop_table('shows_archive')
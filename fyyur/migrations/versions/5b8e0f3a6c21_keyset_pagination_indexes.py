@@ -0,0 +1,34 @@
+"""indexes for keyset pagination of artists and shows
+
+Revision ID: 5b8e0f3a6c21
+Revises: a7d2e4c91b05
+Create Date: 2026-10-18 11:26:05.914372
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '5b8e0f3a6c21'
+down_revision = 'a7d2e4c91b05'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # built concurrently, outside a transaction, like the other show indexes;
+    # (start_time, id) also serves everything ix_shows_start_time did
+    with op.get_context().autocommit_block():
+        op.create_index('ix_artists_name_id', 'artists', ['name', 'id'], unique=False,
+                        postgresql_concurrently=True)
+        op.create_index('ix_shows_start_time_id', 'shows', ['start_time', 'id'], unique=False,
+                        postgresql_concurrently=True)
+        op.drop_index('ix_shows_start_time', table_name='shows', postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.create_index('ix_shows_start_time', 'shows', ['start_time'], unique=False,
+                        postgresql_concurrently=True)
+        op.drop_index('ix_shows_start_time_id', table_name='shows', postgresql_concurrently=True)
+        op.drop_index('ix_artists_name_id', table_name='artists', postgresql_concurrently=True)
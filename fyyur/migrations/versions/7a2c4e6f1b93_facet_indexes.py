@@ -0,0 +1,34 @@
+"""GIN indexes on genres and a location index on artists for faceted browsing
+
+Revision ID: 7a2c4e6f1b93
+Revises: 1d6f9b3e8c07
+Create Date: 2026-10-18 14:22:09.648113
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '7a2c4e6f1b93'
+down_revision = '1d6f9b3e8c07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # built concurrently, outside a transaction, like the other listing indexes;
+    # venues already have ix_venues_state_city
+    with op.get_context().autocommit_block():
+        op.create_index('ix_venues_genres', 'venues', ['genres'], unique=False,
+                        postgresql_using='gin', postgresql_concurrently=True)
+        op.create_index('ix_artists_genres', 'artists', ['genres'], unique=False,
+                        postgresql_using='gin', postgresql_concurrently=True)
+        op.create_index('ix_artists_state_city', 'artists', ['state', 'city'], unique=False,
+                        postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_artists_state_city', table_name='artists', postgresql_concurrently=True)
+        op.drop_index('ix_artists_genres', table_name='artists', postgresql_concurrently=True)
+        op.drop_index('ix_venues_genres', table_name='venues', postgresql_concurrently=True)
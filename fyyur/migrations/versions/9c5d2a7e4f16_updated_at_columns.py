@@ -0,0 +1,40 @@
+"""updated_at on venues, artists and shows for HTTP validators
+
+Revision ID: 9c5d2a7e4f16
+Revises: 7a2c4e6f1b93
+Create Date: 2026-10-18 15:03:41.207395
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c5d2a7e4f16'
+down_revision = '7a2c4e6f1b93'
+branch_labels = None
+depends_on = None
+
+TABLES = ('venues', 'artists', 'shows')
+
+
+def upgrade():
+    # existing rows start at the migration time; the application keeps the column
+    # current from then on
+    for table in TABLES:
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=False,
+                                       server_default=sa.text("(now() AT TIME ZONE 'utc')")))
+
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            op.create_index(f'ix_{table}_updated_at', table, ['updated_at'], unique=False,
+                            postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for table in reversed(TABLES):
+            op.drop_index(f'ix_{table}_updated_at', table_name=table, postgresql_concurrently=True)
+
+    for table in reversed(TABLES):
+        op.drop_column(table, 'updated_at')
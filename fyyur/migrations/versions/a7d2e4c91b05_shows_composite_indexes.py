@@ -0,0 +1,39 @@
+"""composite indexes for the show splits and the venue areas
+
+Revision ID: a7d2e4c91b05
+Revises: 3f1c9a2b7d4e
+Create Date: 2026-10-18 10:03:17.286410
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d2e4c91b05'
+down_revision = '3f1c9a2b7d4e'
+branch_labels = None
+depends_on = None
+
+# The indexes are built CONCURRENTLY so the live tables keep accepting writes,
+# which PostgreSQL only allows outside of a transaction block. A time-relative
+# partial index ("WHERE start_time > now()") is not possible because index
+# predicates must be immutable, and index() ordering by id is already served by
+# the primary keys.
+INDEXES = [
+    ('ix_shows_venue_id_start_time', 'shows', ['venue_id', 'start_time']),
+    ('ix_shows_artist_id_start_time', 'shows', ['artist_id', 'start_time']),
+    ('ix_shows_start_time', 'shows', ['start_time']),
+    ('ix_venues_state_city', 'venues', ['state', 'city']),
+]
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,63 @@
+"""duration_minutes on shows and exclusion constraints against double-booking
+
+Revision ID: b6f3e91a2c57
+Revises: 4e7b1c9d3a68
+Create Date: 2026-10-18 16:31:05.118247
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6f3e91a2c57'
+down_revision = '4e7b1c9d3a68'
+branch_labels = None
+depends_on = None
+
+SHOW_PERIOD = "tsrange(start_time, start_time + duration_minutes * interval '1 minute')"
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    op.add_column('shows', sa.Column('duration_minutes', sa.Integer(), nullable=False, server_default='120'))
+    op.add_column('shows_archive', sa.Column('duration_minutes', sa.Integer(), nullable=False,
+                                             server_default='120'))
+    op.alter_column('shows_archive', 'duration_minutes', server_default=None)
+
+    # existing shows get the default length, cut short where the venue's or the
+    # artist's next show starts earlier, so they satisfy the constraints
+    op.execute("""
+        UPDATE shows SET duration_minutes = least(
+            120,
+            coalesce(floor(extract(epoch FROM following.next_at_venue - shows.start_time) / 60), 120),
+            coalesce(floor(extract(epoch FROM following.next_for_artist - shows.start_time) / 60), 120))
+        FROM (SELECT id,
+                     lead(start_time) OVER (PARTITION BY venue_id ORDER BY start_time, id) AS next_at_venue,
+                     lead(start_time) OVER (PARTITION BY artist_id ORDER BY start_time, id) AS next_for_artist
+              FROM shows) AS following
+        WHERE following.id = shows.id
+          AND (following.next_at_venue < shows.start_time + interval '120 minutes'
+               OR following.next_for_artist < shows.start_time + interval '120 minutes')
+    """)
+    # shows less than a minute apart cannot both be kept; they need a person to decide
+    clashes = op.get_bind().execute(sa.text('SELECT count(*) FROM shows WHERE duration_minutes < 1')).scalar()
+    if clashes:
+        raise RuntimeError(f'{clashes} shows start within a minute of another show of the same venue or artist; '
+                           'delete or move them (SELECT * FROM shows WHERE duration_minutes < 1) and run the '
+                           'migration again')
+
+    op.create_check_constraint('ck_shows_duration_minutes', 'shows', 'duration_minutes > 0')
+    # each builds a GiST index under an exclusive lock on shows; archiving first
+    # keeps that short
+    for column in ('venue_id', 'artist_id'):
+        op.execute(f'ALTER TABLE shows ADD CONSTRAINT ex_shows_{column}_period '
+                   f'EXCLUDE USING gist ({column} WITH =, {SHOW_PERIOD} WITH &&)')
+
+
+def downgrade():
+    for column in ('artist_id', 'venue_id'):
+        op.drop_constraint(f'ex_shows_{column}_period', 'shows')
+    op.drop_constraint('ck_shows_duration_minutes', 'shows')
+    op.drop_column('shows_archive', 'duration_minutes')
+    op.drop_column('shows', 'duration_minutes')
@@ -0,0 +1,38 @@
+"""denormalized upcoming show counters on venues and artists
+
+Revision ID: c41e7a9d2f58
+Revises: 5b8e0f3a6c21
+Create Date: 2026-10-18 13:02:41.207316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41e7a9d2f58'
+down_revision = '5b8e0f3a6c21'
+branch_labels = None
+depends_on = None
+
+OWNERS = (('venues', 'venue_id'), ('artists', 'artist_id'))
+
+
+def upgrade():
+    for table, owner_column in OWNERS:
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('next_show_time', sa.DateTime(), nullable=True))
+        # backfill; from here on counters.refresh() and `flask counters roll` keep them current
+        op.execute(f"""
+            UPDATE {table} SET
+                upcoming_shows_count = (SELECT count(*) FROM shows
+                                        WHERE shows.{owner_column} = {table}.id AND shows.start_time > now()),
+                next_show_time = (SELECT min(start_time) FROM shows
+                                  WHERE shows.{owner_column} = {table}.id AND shows.start_time > now())
+        """)
+
+
+def downgrade():
+    for table, _ in OWNERS:
+        op.drop_column(table, 'next_show_time')
+        op.drop_column(table, 'upcoming_shows_count')
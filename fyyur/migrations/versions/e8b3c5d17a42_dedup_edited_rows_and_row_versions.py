@@ -0,0 +1,71 @@
+"""collapse rows duplicated by edits and add row versions to venues and artists
+
+Revision ID: e8b3c5d17a42
+Revises: c41e7a9d2f58
+Create Date: 2026-10-18 13:31:12.480951
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8b3c5d17a42'
+down_revision = 'c41e7a9d2f58'
+branch_labels = None
+depends_on = None
+
+# table, column of shows pointing at it, columns identifying a duplicate, columns an edit may change
+TABLES = (
+    ('venues', 'venue_id', ('name', 'city', 'state', 'address'),
+     ('phone', 'genres', 'image_link', 'website', 'facebook_link', 'seeking_talent', 'seeking_description')),
+    ('artists', 'artist_id', ('name', 'city', 'state', 'phone'),
+     ('genres', 'image_link', 'website', 'facebook_link', 'seeking_venue', 'seeking_description')),
+)
+
+
+def upgrade():
+    # edits used to insert a new row instead of updating the old one. Every group of
+    # duplicates collapses into its oldest row, which keeps its id (and so every link
+    # to it) but takes the values of the newest row, the result of the last edit;
+    # shows of the other rows move to it before those rows are deleted.
+    for table, owner_column, identity, edited in TABLES:
+        op.execute(f"""
+            CREATE TEMPORARY TABLE {table}_duplicates ON COMMIT DROP AS
+            SELECT id, min(id) OVER same AS keep_id, max(id) OVER same AS latest_id
+            FROM {table}
+            WINDOW same AS (PARTITION BY {', '.join(identity)})
+        """)
+        op.execute(f"""
+            UPDATE {table} SET ({', '.join(edited)}) = (
+                SELECT {', '.join(edited)} FROM {table} latest WHERE latest.id = duplicates.latest_id)
+            FROM {table}_duplicates duplicates
+            WHERE {table}.id = duplicates.id AND duplicates.id = duplicates.keep_id
+              AND duplicates.keep_id <> duplicates.latest_id
+        """)
+        op.execute(f"""
+            UPDATE shows SET {owner_column} = duplicates.keep_id
+            FROM {table}_duplicates duplicates
+            WHERE shows.{owner_column} = duplicates.id AND duplicates.id <> duplicates.keep_id
+        """)
+        op.execute(f"""
+            DELETE FROM {table} USING {table}_duplicates duplicates
+            WHERE {table}.id = duplicates.id AND duplicates.id <> duplicates.keep_id
+        """)
+        # the kept rows now own the shows of their duplicates
+        op.execute(f"""
+            UPDATE {table} SET
+                upcoming_shows_count = (SELECT count(*) FROM shows
+                                        WHERE shows.{owner_column} = {table}.id AND shows.start_time > now()),
+                next_show_time = (SELECT min(start_time) FROM shows
+                                  WHERE shows.{owner_column} = {table}.id AND shows.start_time > now())
+            WHERE id IN (SELECT keep_id FROM {table}_duplicates WHERE id <> keep_id)
+        """)
+
+        op.add_column(table, sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    # the collapsed duplicates are not restored
+    for table, _, _, _ in TABLES:
+        op.drop_column(table, 'version')
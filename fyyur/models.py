@@ -1,9 +1,31 @@
 # ----------------------------------------------------------------------------#
 # Imports & setups
 # ----------------------------------------------------------------------------#
-from flask_sqlalchemy import SQLAlchemy
+from datetime import datetime
+from sqlalchemy import DDL, DateTime, event
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+from replicas import RoutingSQLAlchemy
 
-db = SQLAlchemy()
+# sessions send the reads of GET requests to a read replica, see replicas.py
+db = RoutingSQLAlchemy()
+
+
+class utcnow(FunctionElement):
+    # the current UTC time as a timestamp without time zone, the server default
+    # of the updated_at columns
+    type = DateTime()
+
+
+@compiles(utcnow, 'postgresql')
+def _postgresql_utcnow(element, compiler, **kw):
+    return "(now() AT TIME ZONE 'utc')"
+
+
+@compiles(utcnow)
+def _utcnow(element, compiler, **kw):
+    # SQLite's CURRENT_TIMESTAMP is in UTC
+    return 'CURRENT_TIMESTAMP'
 
 
 # ----------------------------------------------------------------------------#
@@ -13,6 +35,16 @@ db = SQLAlchemy()
 
 class Venue(db.Model):
     __tablename__ = 'venues'
+    __table_args__ = (
+        # trigram index backing the name search (requires the pg_trgm extension)
+        db.Index('ix_venues_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        # area grouping and ordering of the /venues listing
+        db.Index('ix_venues_state_city', 'state', 'city'),
+        # genre filter of the faceted listings (genres @> ARRAY[...])
+        db.Index('ix_venues_genres', 'genres', postgresql_using='gin'),
+        # max(updated_at) of the HTTP validators
+        db.Index('ix_venues_updated_at', 'updated_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120), nullable=False)
@@ -20,12 +52,21 @@ class Venue(db.Model):
     state = db.Column(db.String(20), nullable=False)
     address = db.Column(db.String(120), nullable=False)
     phone = db.Column(db.String(14), nullable=False)
-    genres = db.Column(db.ARRAY(db.String()), nullable=False)
+    genres = db.Column(db.ARRAY(db.String()).with_variant(db.JSON(), 'sqlite'), nullable=False)
     image_link = db.Column(db.String(500))
     website = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     seeking_talent = db.Column(db.Boolean(), default=False)
     seeking_description = db.Column(db.String(500))
+    # maintained by counters.refresh() on every show write and rolled forward by `flask counters roll`
+    upcoming_shows_count = db.Column(db.Integer(), nullable=False, default=0, server_default='0')
+    next_show_time = db.Column(db.DateTime())
+    # bumped by every UPDATE, which only applies while the row still has the version it was read with
+    version = db.Column(db.Integer(), nullable=False, server_default='1')
+    # UTC time of the last write, read by the HTTP validators unless the page cache is shared
+    updated_at = db.Column(db.DateTime(), nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow,
+                           server_default=utcnow())
+    __mapper_args__ = {'version_id_col': version}
 
     # debugging - will print the id and name of each venue
     def __repr__(self):
@@ -37,18 +78,38 @@ class Venue(db.Model):
 
 class Artist(db.Model):
     __tablename__ = 'artists'
+    __table_args__ = (
+        # trigram index backing the name search (requires the pg_trgm extension)
+        db.Index('ix_artists_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        # keyset pagination of the /artists listing
+        db.Index('ix_artists_name_id', 'name', 'id'),
+        # genre and location filters of the faceted listings
+        db.Index('ix_artists_genres', 'genres', postgresql_using='gin'),
+        db.Index('ix_artists_state_city', 'state', 'city'),
+        # max(updated_at) of the HTTP validators
+        db.Index('ix_artists_updated_at', 'updated_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120), nullable=False)
     city = db.Column(db.String(120), nullable=False)
     state = db.Column(db.String(20), nullable=False)
     phone = db.Column(db.String(14), nullable=False)
-    genres = db.Column(db.ARRAY(db.String()), nullable=False)
+    genres = db.Column(db.ARRAY(db.String()).with_variant(db.JSON(), 'sqlite'), nullable=False)
     image_link = db.Column(db.String(500))
     website = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     seeking_venue = db.Column(db.Boolean(), default=False)
     seeking_description = db.Column(db.String(500))
+    # maintained by counters.refresh() on every show write and rolled forward by `flask counters roll`
+    upcoming_shows_count = db.Column(db.Integer(), nullable=False, default=0, server_default='0')
+    next_show_time = db.Column(db.DateTime())
+    # bumped by every UPDATE, which only applies while the row still has the version it was read with
+    version = db.Column(db.Integer(), nullable=False, server_default='1')
+    # UTC time of the last write, read by the HTTP validators unless the page cache is shared
+    updated_at = db.Column(db.DateTime(), nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow,
+                           server_default=utcnow())
+    __mapper_args__ = {'version_id_col': version}
 
     # debugging - will print the id and name of each artist
     def __repr__(self):
@@ -58,8 +119,25 @@ class Artist(db.Model):
                f'seeking_description: {self.seeking_description}, shows: {self.show}>'
 
 
+# the trigram indexes on venue and artist names need pg_trgm, which the
+# migrations create as well
+for _table in (Venue.__table__, Artist.__table__):
+    event.listen(_table, 'before_create',
+                 DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql'))
+
+
 class Show(db.Model):
     __tablename__ = 'shows'
+    __table_args__ = (
+        # upcoming/past split of the venue and artist pages
+        db.Index('ix_shows_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_shows_artist_id_start_time', 'artist_id', 'start_time'),
+        # keyset pagination of the upcoming /shows listing
+        db.Index('ix_shows_start_time_id', 'start_time', 'id'),
+        # max(updated_at) of the HTTP validators
+        db.Index('ix_shows_updated_at', 'updated_at'),
+        db.CheckConstraint('duration_minutes > 0', name='ck_shows_duration_minutes'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     artist_id = db.Column(db.Integer, db.ForeignKey('artists.id'), nullable=False)
@@ -67,3 +145,53 @@ class Show(db.Model):
     venue_id = db.Column(db.Integer, db.ForeignKey('venues.id'), nullable=False)
     venue = db.relationship('Venue', backref='show', lazy=True)
     start_time = db.Column(db.DateTime(), nullable=False)
+    # how long the show holds its venue and artist, see booking.py
+    duration_minutes = db.Column(db.Integer(), nullable=False, default=120, server_default='120')
+    # UTC time of the last write, read by the HTTP validators unless the page cache is shared
+    updated_at = db.Column(db.DateTime(), nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow,
+                           server_default=utcnow())
+
+
+# no two shows of a venue, or of an artist, overlap; exclusion constraints only
+# exist on PostgreSQL, where the migrations create them as well
+SHOW_PERIOD = "tsrange(start_time, start_time + duration_minutes * interval '1 minute')"
+event.listen(Show.__table__, 'before_create',
+             DDL('CREATE EXTENSION IF NOT EXISTS btree_gist').execute_if(dialect='postgresql'))
+for _column in ('venue_id', 'artist_id'):
+    event.listen(Show.__table__, 'after_create', DDL(
+        f'ALTER TABLE shows ADD CONSTRAINT ex_shows_{_column}_period '
+        f'EXCLUDE USING gist ({_column} WITH =, {SHOW_PERIOD} WITH &&)'
+    ).execute_if(dialect='postgresql'))
+
+
+class AreaDirectory(db.Model):
+    # one row per (state, city) with its venues already grouped, read by the /venues
+    # listing and kept current by directory.refresh_areas()
+    __tablename__ = 'area_directory'
+
+    state = db.Column(db.String(20), primary_key=True)
+    city = db.Column(db.String(120), primary_key=True)
+    # [{"id": ..., "name": ..., "num_upcoming_shows": ...}, ...] in name order
+    venues = db.Column(db.JSON(), nullable=False)
+    venue_count = db.Column(db.Integer(), nullable=False)
+    upcoming_shows_count = db.Column(db.Integer(), nullable=False)
+
+
+class ShowArchive(db.Model):
+    # past shows moved out of shows by `flask archive shows`, so the hot table only
+    # holds recent and upcoming shows; no foreign keys, archived history outlives
+    # the venues and artists it names
+    __tablename__ = 'shows_archive'
+    __table_args__ = (
+        # rows arrive in start_time order, so a BRIN index serves date ranges at a
+        # fraction of a B-tree's size
+        db.Index('ix_shows_archive_start_time', 'start_time', postgresql_using='brin'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    artist_id = db.Column(db.Integer, nullable=False)
+    venue_id = db.Column(db.Integer, nullable=False)
+    start_time = db.Column(db.DateTime(), nullable=False)
+    duration_minutes = db.Column(db.Integer(), nullable=False)
+    updated_at = db.Column(db.DateTime(), nullable=False)
+    archived_at = db.Column(db.DateTime(), nullable=False, default=datetime.utcnow, server_default=utcnow())
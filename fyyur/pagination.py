@@ -0,0 +1,43 @@
+# ----------------------------------------------------------------------------#
+# Keyset (cursor) pagination.
+#
+# A page is the next `per_page` rows after the sort key of the last row seen,
+# so fetching page 1000 costs the same index range scan as page 1 instead of
+# skipping over every earlier row like OFFSET does. The sort key is handed to
+# the client as an opaque, URL-safe cursor.
+# ----------------------------------------------------------------------------#
+
+import base64
+import json
+from datetime import datetime
+from flask import abort
+from sqlalchemy import tuple_
+
+
+def encode_cursor(values):
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, parsers):
+    # parsers turn each decoded JSON value back into the type of its sort column
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if len(values) != len(parsers):
+            raise ValueError(cursor)
+        return [parse(value) for parse, value in zip(parsers, values)]
+    except (ValueError, TypeError):
+        abort(400, 'invalid cursor')
+
+
+def keyset_page(query, columns, parsers, cursor, per_page):
+    # `columns` must be unique together (end with the primary key) and be
+    # covered by an index for the range scan to be cheap
+    if cursor:
+        query = query.filter(tuple_(*columns) > tuple_(*decode_cursor(cursor, parsers)))
+    rows = query.order_by(*columns).limit(per_page + 1).all()
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor([getattr(rows[-1], column.key) for column in columns])
+    return rows, next_cursor
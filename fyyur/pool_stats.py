@@ -0,0 +1,67 @@
+# ----------------------------------------------------------------------------#
+# Connection pool statistics.
+#
+# The engine's QueuePool is swapped for a subclass that times every connection
+# checkout, so the time requests spend waiting for a free connection shows up
+# next to the pool's own checked-out and overflow counts at /pool/stats.
+# ----------------------------------------------------------------------------#
+
+import time
+from threading import Lock
+from flask import jsonify
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+
+from models import db
+
+_lock = Lock()
+stats = {
+    "checkouts": 0,
+    "timeouts": 0,
+    "wait_seconds_total": 0.0,
+    "wait_seconds_max": 0.0
+}
+
+
+class InstrumentedQueuePool(QueuePool):
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            with _lock:
+                stats["timeouts"] += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            with _lock:
+                stats["checkouts"] += 1
+                stats["wait_seconds_total"] += waited
+                stats["wait_seconds_max"] = max(stats["wait_seconds_max"], waited)
+
+
+def pool_status():
+    pool = db.engine.pool
+    status = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow()
+        })
+    with _lock:
+        status.update(stats)
+    return status
+
+
+def pool_stats():
+    return jsonify(pool_status())
+
+
+def init_app(app):
+    options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    # only pooled (Postgres) configurations get the instrumented pool
+    if 'pool_size' in options:
+        options.setdefault('poolclass', InstrumentedQueuePool)
+    app.add_url_rule('/pool/stats', 'pool_stats', pool_stats)
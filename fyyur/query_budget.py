@@ -0,0 +1,57 @@
+# ----------------------------------------------------------------------------#
+# Per-request SQL statement counting and query budgets for views.
+#
+# A view decorated with @query_budget.limit(n) may issue at most n statements per
+# request. Going over budget raises QueryBudgetExceeded when the app is in
+# testing mode (or QUERY_BUDGET_STRICT is set), so an N+1 regression fails the
+# test that renders the page; otherwise it is only logged as a warning.
+# ----------------------------------------------------------------------------#
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def limit(statements):
+    def decorator(view):
+        view.query_budget = statements
+        return view
+    return decorator
+
+
+def query_count(request_globals=None):
+    # statements of the current request, or of the request whose g is given
+    return (request_globals or g).get('query_count', 0)
+
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g.query_count = g.get('query_count', 0) + 1
+
+
+def _reset_count():
+    g.query_count = 0
+
+
+def _check_budget(response):
+    view = current_app.view_functions.get(request.endpoint)
+    budget = getattr(view, 'query_budget', current_app.config.get('QUERY_BUDGET_DEFAULT'))
+    if budget is None or query_count() <= budget:
+        return response
+
+    message = f'{request.endpoint} issued {query_count()} SQL statements, over its budget of {budget}'
+    if current_app.config.get('QUERY_BUDGET_STRICT', current_app.testing):
+        raise QueryBudgetExceeded(message)
+    current_app.logger.warning(message)
+    return response
+
+
+def init_app(app):
+    if not event.contains(Engine, 'before_cursor_execute', _count_statement):
+        event.listen(Engine, 'before_cursor_execute', _count_statement)
+    app.before_request(_reset_count)
+    app.after_request(_check_budget)
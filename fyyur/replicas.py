@@ -0,0 +1,193 @@
+# ----------------------------------------------------------------------------#
+# Read replica routing.
+#
+# Replicas are listed in REPLICA_BINDS, bind keys of SQLALCHEMY_BINDS, so
+# Flask-SQLAlchemy builds their engines with the same pool options as the
+# primary's. A GET or HEAD request picks one healthy replica up front and the
+# session sends its SELECTs there; flushes, INSERT/UPDATE/DELETE, SELECT ... FOR
+# UPDATE and every statement of any other request go to the primary, as do the
+# endpoints in PRIMARY_ENDPOINTS.
+#
+# A background thread in each worker process checks every replica every
+# REPLICA_CHECK_INTERVAL seconds and takes it out of rotation while it is
+# unreachable or more than REPLICA_MAX_LAG seconds behind; a replica connection
+# that drops mid-request takes it out at once. With no healthy replica the
+# reads fall back to the primary.
+#
+# After a write request succeeds the client's session reads from the primary
+# for READ_YOUR_WRITES_SECONDS, so the page an edit redirects to shows the edit
+# even when the replicas have not replayed it yet.
+#
+# Pages under the page cache and the HTTP validators are keyed by the cache
+# versions of their tables, which a write moves at once. A page whose tables
+# were written more recently than a replica may lag behind is read from the
+# primary (avoid_lag()), so a cached page or an ETag of the new version never
+# holds rows a replica had not replayed yet.
+# ----------------------------------------------------------------------------#
+
+import os
+import threading
+import time
+from itertools import count
+from flask import current_app, g, has_app_context, jsonify, request, session
+from flask_sqlalchemy import SignallingSession, SQLAlchemy, get_state
+from sqlalchemy import event, exc, orm, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql.expression import Select, TextClause, UpdateBase
+
+# GET pages whose reads must be current: the edit forms carry the row version
+# that the submission is checked against
+PRIMARY_ENDPOINTS = {'main.edit_venue', 'main.edit_artist'}
+
+READ_METHODS = ('GET', 'HEAD')
+
+# session key holding the time until which this client reads from the primary
+STICKY_KEY = 'read_primary_until'
+
+# postgres: seconds the replica's replay is behind, 0 while it has replayed all it received
+LAG_QUERY = text("SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                 "ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp()) END")
+
+_lock = threading.Lock()
+_next_replica = count()
+_checker_pid = None
+_engines = {}
+health = {}
+
+
+class RoutingSession(SignallingSession):
+    def get_bind(self, mapper=None, clause=None):
+        bind_key = g.get('replica_bind') if has_app_context() else None
+        if bind_key is not None and not self._flushing and _is_read(clause):
+            return get_state(self.app).db.get_engine(self.app, bind=bind_key)
+        return super().get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+def _is_read(clause):
+    if clause is None or isinstance(clause, (UpdateBase, TextClause)):
+        return False
+    return not (isinstance(clause, Select) and clause._for_update_arg is not None)
+
+
+def _engine(app, bind_key):
+    engine = get_state(app).db.get_engine(app, bind=bind_key)
+    _engines[engine] = bind_key
+    return engine
+
+
+def _check(app, bind_key):
+    try:
+        engine = _engine(app, bind_key)
+        with engine.connect() as connection:
+            lag = connection.execute(LAG_QUERY).scalar() if engine.dialect.name == 'postgresql' else 0
+        lag = float(lag or 0)
+    except Exception as error:
+        # unreachable, but also a pool timeout or a bad URL: out of rotation until a check succeeds
+        message = str(error.orig) if isinstance(error, exc.DBAPIError) else f'{type(error).__name__}: {error}'
+        return {"healthy": False, "lag_seconds": None, "error": message, "checked_at": time.time()}
+    return {"healthy": lag <= app.config['REPLICA_MAX_LAG'], "lag_seconds": lag, "error": None,
+            "checked_at": time.time()}
+
+
+def check_replicas(app):
+    for bind_key in app.config['REPLICA_BINDS']:
+        status = _check(app, bind_key)
+        with _lock:
+            previous = health.get(bind_key, {})
+            health[bind_key] = status
+        if status["healthy"] != previous.get("healthy", True):
+            app.logger.warning(f'replica {bind_key} is {"back in" if status["healthy"] else "out of"} rotation'
+                               f'{"" if status["healthy"] else ": " + (status["error"] or "lagging")}')
+
+
+def _run_checks(app):
+    # the only checker of this process, so nothing may end the loop
+    while True:
+        try:
+            with app.app_context():
+                check_replicas(app)
+        except Exception:
+            app.logger.exception('replica check failed')
+        time.sleep(app.config['REPLICA_CHECK_INTERVAL'])
+
+
+def _start_checker(app):
+    # one checker per worker process; threads do not survive a fork, so a
+    # preloaded app starts its checker on the first request of each worker
+    global _checker_pid
+    with _lock:
+        if _checker_pid == os.getpid():
+            return
+        _checker_pid = os.getpid()
+        health.clear()
+    threading.Thread(target=_run_checks, args=(app,), name='replica-checks', daemon=True).start()
+
+
+def healthy_replicas():
+    with _lock:
+        return [bind_key for bind_key in current_app.config['REPLICA_BINDS']
+                if health.get(bind_key, {}).get("healthy")]
+
+
+def _mark_down(context):
+    bind_key = _engines.get(context.engine)
+    if bind_key is not None and context.is_disconnect:
+        with _lock:
+            health[bind_key] = {"healthy": False, "lag_seconds": None, "error": str(context.original_exception),
+                                "checked_at": time.time()}
+
+
+def _choose_bind():
+    if not current_app.config['REPLICA_BINDS']:
+        return
+    _start_checker(current_app._get_current_object())
+    if request.method not in READ_METHODS or request.endpoint in PRIMARY_ENDPOINTS:
+        return
+    if session.get(STICKY_KEY, 0) > time.time():
+        return
+    replicas = healthy_replicas()
+    if replicas:
+        g.replica_bind = replicas[next(_next_replica) % len(replicas)]
+
+
+def avoid_lag(modified):
+    # modified: unix time of the newest write to the page's tables; a replica is
+    # at most REPLICA_MAX_LAG behind when checked, and can fall further behind
+    # until the next check
+    if g.get('replica_bind') is None:
+        return
+    config = current_app.config
+    if modified > time.time() - config['REPLICA_MAX_LAG'] - config['REPLICA_CHECK_INTERVAL']:
+        g.replica_bind = None
+
+
+def _stick_to_primary(response):
+    if request.method not in READ_METHODS and response.status_code < 400:
+        session[STICKY_KEY] = time.time() + current_app.config['READ_YOUR_WRITES_SECONDS']
+    return response
+
+
+def replica_health():
+    with _lock:
+        return {bind_key: health.get(bind_key) for bind_key in current_app.config['REPLICA_BINDS']}
+
+
+def replica_status():
+    return jsonify(replica_health())
+
+
+def init_app(app):
+    app.config.setdefault('REPLICA_BINDS', [])
+    app.config.setdefault('REPLICA_CHECK_INTERVAL', 5)
+    app.config.setdefault('REPLICA_MAX_LAG', 10)
+    app.config.setdefault('READ_YOUR_WRITES_SECONDS', 10)
+    if not event.contains(Engine, 'handle_error', _mark_down):
+        event.listen(Engine, 'handle_error', _mark_down)
+    app.before_request(_choose_bind)
+    app.after_request(_stick_to_primary)
+    app.add_url_rule('/replicas/status', 'replica_status', replica_status)
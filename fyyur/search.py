@@ -0,0 +1,137 @@
+# ----------------------------------------------------------------------------#
+# Name search for venues and artists.
+#
+# On PostgreSQL matching is done with ILIKE, which the pg_trgm GIN indexes on
+# the name columns serve without a sequential scan, and results are ranked by
+# trigram similarity. Other databases (SQLite test runs) use an in-memory
+# trigram index that mimics the same matching and ranking in pure Python.
+# ----------------------------------------------------------------------------#
+
+import re
+from collections import defaultdict, namedtuple
+from sqlalchemy import event, func
+
+from models import db, Venue, Artist
+
+# items is a list of (id, name) rows for the requested page, total counts every match
+SearchPage = namedtuple('SearchPage', ['items', 'total', 'page', 'per_page'])
+
+_WORD = re.compile(r'[^\W_]+')
+
+
+def trigrams(text):
+    # same rules as pg_trgm: lower-cased alphanumeric words, each padded with
+    # two spaces in front and one behind
+    grams = set()
+    for word in _WORD.findall(text.lower()):
+        padded = '  ' + word + ' '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(left, right):
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
+
+
+class TrigramIndex:
+    def __init__(self, rows=()):
+        self._names = {}
+        self._grams = {}
+        self._postings = defaultdict(set)
+        for row_id, name in rows:
+            self.add(row_id, name)
+
+    def add(self, row_id, name):
+        self.remove(row_id)
+        grams = trigrams(name)
+        self._names[row_id] = name
+        self._grams[row_id] = grams
+        for gram in grams:
+            self._postings[gram].add(row_id)
+
+    def remove(self, row_id):
+        for gram in self._grams.pop(row_id, ()):
+            self._postings[gram].discard(row_id)
+        self._names.pop(row_id, None)
+
+    def _candidates(self, term_grams):
+        # every trigram of a substring that is made of whole words also occurs in the
+        # matching name; partial words only contribute their inner trigrams, so only
+        # intersect on those to keep the candidate set a superset of the ILIKE matches
+        inner = [gram for gram in term_grams if ' ' not in gram]
+        if not inner:
+            return self._names.keys()
+        candidates = None
+        for gram in sorted(inner, key=lambda g: len(self._postings.get(g, ()))):
+            posting = self._postings.get(gram, set())
+            candidates = posting if candidates is None else candidates & posting
+            if not candidates:
+                break
+        return candidates
+
+    def search(self, term, offset, limit):
+        needle = term.lower()
+        term_grams = trigrams(term)
+        matches = [(row_id, self._names[row_id]) for row_id in self._candidates(term_grams)
+                   if needle in self._names[row_id].lower()]
+        matches.sort(key=lambda row: (-similarity(term_grams, self._grams[row[0]]), row[1]))
+        return len(matches), matches[offset:offset + limit]
+
+
+# ----------------------------------------------------------------------------#
+# Fallback index cache, dropped whenever a venue or artist is written.
+# ----------------------------------------------------------------------------#
+
+_indexes = {}
+
+
+def _fallback_index(model):
+    index = _indexes.get(model)
+    if index is None:
+        index = _indexes[model] = TrigramIndex(db.session.query(model.id, model.name))
+    return index
+
+
+def _invalidate(mapper, connection, target):
+    _indexes.pop(type(target), None)
+
+
+for _model in (Venue, Artist):
+    for _event in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(_model, _event, _invalidate)
+
+
+# ----------------------------------------------------------------------------#
+# Public interface.
+# ----------------------------------------------------------------------------#
+
+def _escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def search(model, term, page=1, per_page=20):
+    term = (term or '').strip()
+    page = max(page, 1)
+    if not term:
+        # an empty term used to return the whole table
+        return SearchPage([], 0, page, per_page)
+    offset = (page - 1) * per_page
+
+    if db.engine.dialect.name != 'postgresql':
+        total, items = _fallback_index(model).search(term, offset, per_page)
+        return SearchPage(items, total, page, per_page)
+
+    matches = db.session.query(model.id, model.name). \
+        filter(model.name.ilike('%' + _escape_like(term) + '%', escape='\\'))
+    # the page and the number of all matches in one query
+    rows = matches.add_columns(func.count().over().label('total')). \
+        order_by(func.similarity(model.name, term).desc(), model.name). \
+        offset(offset).limit(per_page).all()
+    if rows:
+        total = rows[0].total
+    else:
+        # past the last page no row carries the total
+        total = matches.count() if offset else 0
+    return SearchPage([(row.id, row.name) for row in rows], total, page, per_page)
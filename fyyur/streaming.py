@@ -0,0 +1,51 @@
+# ----------------------------------------------------------------------------#
+# Streaming rendering for large listings.
+#
+# stream_template() renders a template with Jinja's generate() inside the
+# response, so the first bytes go out before the listing is queried. Rows come
+# from StreamedRows, which reads the query through a server-side cursor in
+# batches of STREAM_BATCH_SIZE; memory is bounded by a batch rather than by the
+# result set. Until the template first touches its rows, every chunk is passed
+# straight to the server, which sends the layout header before the query runs;
+# after that chunks are joined into writes of about STREAM_BUFFER_SIZE bytes.
+# ----------------------------------------------------------------------------#
+
+from flask import Response, current_app, request, stream_with_context
+
+
+class StreamedRows:
+    def __init__(self, query):
+        self.query = query
+        self.started = False
+
+    def __iter__(self):
+        self.started = True
+        return iter(self.query.yield_per(current_app.config['STREAM_BATCH_SIZE']))
+
+
+def _chunks(template, context, rows):
+    buffer_size = current_app.config['STREAM_BUFFER_SIZE']
+    buffered, size = [], 0
+    for chunk in template.generate(context):
+        if not rows.started:
+            yield chunk
+            continue
+        buffered.append(chunk)
+        size += len(chunk)
+        if size >= buffer_size:
+            yield ''.join(buffered)
+            buffered, size = [], 0
+    if buffered:
+        yield ''.join(buffered)
+
+
+def stream_template(template_name, rows, **context):
+    app = current_app._get_current_object()
+    app.update_template_context(context)
+    template = app.jinja_env.get_template(template_name)
+    return Response(stream_with_context(_chunks(template, context, rows)), mimetype='text/html')
+
+
+def streaming_requested():
+    # a listing is streamed in full when asked for with ?stream=1
+    return current_app.config['STREAMING_ENABLED'] and request.args.get('stream') == '1'
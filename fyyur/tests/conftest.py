@@ -0,0 +1,66 @@
+# ----------------------------------------------------------------------------#
+# Test app on an in-memory SQLite database, in testing mode, so a view that
+# goes over its query budget raises QueryBudgetExceeded.
+# ----------------------------------------------------------------------------#
+
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# read by config.py when the app module imports it; never the real database
+os.environ['DATABASE_URL'] = 'sqlite://'
+os.environ.setdefault('SECRET_KEY', 'fyyur-test-key')
+
+import cache  # noqa: E402
+import counters  # noqa: E402
+import search  # noqa: E402
+from app import create_app  # noqa: E402
+from models import db, Venue, Artist, Show  # noqa: E402
+
+VENUES = 4
+ARTISTS = 8
+
+
+def seed():
+    # every artist plays every venue once, so each venue page lists eight artists,
+    # half of the shows past and half upcoming; no two shows of a venue or of an
+    # artist overlap
+    now = datetime.now().replace(minute=0, second=0, microsecond=0)
+    for number in range(1, VENUES + 1):
+        db.session.add(Venue(id=number, name=f'The Venue {number}', city=('San Francisco', 'New York')[number % 2],
+                             state=('CA', 'NY')[number % 2], address=f'{number} Main Street',
+                             phone='123-123-1234', genres=['Jazz', 'Folk']))
+    for number in range(1, ARTISTS + 1):
+        db.session.add(Artist(id=number, name=f'Artist {chr(ord("A") + ARTISTS - number)} Band',
+                              city='San Francisco', state='CA', phone='326-123-5000', genres=['Jazz']))
+    db.session.flush()
+    for venue_id in range(1, VENUES + 1):
+        for artist_id in range(1, ARTISTS + 1):
+            db.session.add(Show(artist_id=artist_id, venue_id=venue_id,
+                                start_time=now + timedelta(days=artist_id - 5, hours=3 * venue_id - 2)))
+    db.session.flush()
+    counters.recompute()
+    db.session.commit()
+
+
+@pytest.fixture(scope='session')
+def app():
+    app = create_app()
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    return app
+
+
+@pytest.fixture
+def client(app):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        seed()
+        db.session.remove()
+    search._indexes.clear()
+    cache.invalidate('venues', 'artists', 'shows')
+    return app.test_client()
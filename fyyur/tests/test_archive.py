@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+
+import archive
+from conftest import VENUES, ARTISTS
+from models import Show, ShowArchive, Venue
+
+# half of the seeded shows have started: those of artists 1 to 4
+PAST_SHOWS = VENUES * ARTISTS // 2
+
+
+def current_hour():
+    return datetime.now().replace(minute=0, second=0, microsecond=0)
+
+
+def counts(app):
+    with app.app_context():
+        return Show.query.count(), ShowArchive.query.count()
+
+
+def run(app, *args):
+    return app.test_cli_runner().invoke(args=['archive', 'shows', *args])
+
+
+def test_shows_before_the_cutoff_move_in_batches(app, client):
+    # artists 1 and 2 played every venue more than two days ago
+    with app.app_context():
+        assert archive.archive_shows(current_hour() - timedelta(days=2), batch_size=3) == 2 * VENUES
+        archived = ShowArchive.query.order_by(ShowArchive.start_time).all()
+        assert {show.artist_id for show in archived} == {1, 2}
+        assert all(show.archived_at is not None for show in archived)
+        assert archive.archive_shows(current_hour() - timedelta(days=2), batch_size=3) == 0
+    assert counts(app) == (VENUES * ARTISTS - 2 * VENUES, 2 * VENUES)
+
+
+def test_command_archives_every_started_show(app, client):
+    assert b'4 Past Shows' in client.get('/venues/1').data
+
+    result = run(app, '--before', datetime.now().strftime('%Y-%m-%d %H:%M:%S'), '--batch-size', 5)
+    assert result.exit_code == 0
+    assert f'archived {PAST_SHOWS} shows' in result.output
+    assert counts(app) == (VENUES * ARTISTS - PAST_SHOWS, PAST_SHOWS)
+
+    page = client.get('/venues/1').data
+    assert b'0 Past Shows' in page
+    assert b'4 Upcoming Shows' in page
+    with app.app_context():
+        assert Venue.query.get(1).upcoming_shows_count == 4
+
+
+def test_default_cutoff_follows_the_config(app, client, monkeypatch):
+    # only artist 1 played more than three days ago
+    monkeypatch.setitem(app.config, 'SHOW_ARCHIVE_AFTER_DAYS', 3)
+    result = run(app)
+    assert result.exit_code == 0
+    assert f'archived {VENUES} shows' in result.output
+    assert counts(app) == (VENUES * ARTISTS - VENUES, VENUES)
+
+
+def test_upcoming_shows_cannot_be_archived(app, client):
+    result = run(app, '--before', (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d %H:%M:%S'))
+    assert result.exit_code == 2
+    assert 'upcoming shows cannot be archived' in result.output
+    assert counts(app) == (VENUES * ARTISTS, 0)
@@ -0,0 +1,114 @@
+import csv
+import json
+
+from booking import VENUE_BOOKED
+from conftest import VENUES, ARTISTS
+from models import Venue, Artist, Show
+
+LINKS = {'website': 'https://example.com', 'facebook_link': 'https://www.facebook.com/example'}
+
+VENUE_COLUMNS = ['name', 'city', 'state', 'address', 'phone', 'genres', 'website', 'facebook_link']
+
+
+def run(app, *args):
+    return app.test_cli_runner().invoke(args=['data', *map(str, args)])
+
+
+def write_jsonl(path, rows):
+    path.write_text(''.join(json.dumps(row) + '\n' for row in rows))
+    return path
+
+
+def test_invalid_venue_rows_are_rejected_and_the_rest_imported(app, client, tmp_path):
+    path = tmp_path / 'venues.csv'
+    with path.open('w', newline='') as stream:
+        writer = csv.writer(stream)
+        writer.writerow(VENUE_COLUMNS)
+        writer.writerow(['The Oakland Venue', 'Oakland', 'CA', '9 Main Street', '123-123-1234', 'Jazz,Folk',
+                         'https://example.com', 'https://www.facebook.com/example'])
+        writer.writerow(['The Short Venue', 'Oakland', 'CA', '10 Main Street', '123', 'Jazz',
+                         'https://example.com', 'https://www.facebook.com/example'])
+        writer.writerow(['', 'Oakland', 'CA', '11 Main Street', '123-123-1234', 'Jazz',
+                         'not a link', 'https://www.facebook.com/example'])
+
+    result = run(app, 'import', 'venues', path)
+    assert result.exit_code == 0
+    assert 'imported 1 venues' in result.output
+    assert 'rejected 2' in result.output
+    assert 'row 2: phone:' in result.output
+    assert 'row 3: name:' in result.output and 'website:' in result.output
+
+    with app.app_context():
+        assert Venue.query.count() == VENUES + 1
+        venue = Venue.query.filter_by(name='The Oakland Venue').one()
+        assert venue.genres == ['Jazz', 'Folk']
+    assert b'The Oakland Venue' in client.get('/venues').data
+
+
+def test_imported_artists_keep_their_ids(app, client, tmp_path):
+    path = write_jsonl(tmp_path / 'artists.jsonl', [
+        {'id': 20, 'name': 'Imported Band', 'city': 'Oakland', 'state': 'CA', 'phone': '326-123-5000',
+         'genres': ['Blues'], 'seeking_venue': 'yes', **LINKS},
+        {'id': 21, 'name': 'Phoneless Band', 'city': 'Oakland', 'state': 'CA', 'genres': ['Blues'], **LINKS},
+    ])
+
+    result = run(app, 'import', 'artists', path)
+    assert result.exit_code == 0
+    assert 'imported 1 artists' in result.output
+    assert 'row 2: phone:' in result.output
+
+    with app.app_context():
+        artist = Artist.query.get(20)
+        assert (artist.name, artist.genres, artist.seeking_venue) == ('Imported Band', ['Blues'], True)
+        assert Artist.query.count() == ARTISTS + 1
+
+
+def test_shows_with_unknown_ids_or_clashes_are_rejected(app, client, tmp_path):
+    path = write_jsonl(tmp_path / 'shows.jsonl', [
+        {'artist_id': 1, 'venue_id': 3, 'start_time': '2030-01-01 20:00:00'},
+        {'artist_id': 1, 'venue_id': 99, 'start_time': '2030-01-02 20:00:00'},
+        {'artist_id': 2, 'venue_id': 3, 'start_time': '2030-01-01 21:00:00'},
+        {'artist_id': 'one', 'venue_id': 3, 'start_time': '2030-01-03 20:00:00'},
+        {'artist_id': 2, 'venue_id': 3, 'start_time': 'next tuesday'},
+        {'artist_id': 2, 'venue_id': 4, 'start_time': '2030-01-01 20:00:00', 'duration_minutes': 90},
+    ])
+
+    result = run(app, 'import', 'shows', path, '--batch-size', 4)
+    assert result.exit_code == 0
+    assert 'imported 2 shows' in result.output
+    assert 'rejected 4' in result.output
+    assert 'row 2: unknown venue_id' in result.output
+    assert f'row 3: {VENUE_BOOKED}' in result.output
+    assert 'row 4: artist_id and venue_id must be numbers' in result.output
+    assert 'row 5: start_time:' in result.output
+
+    with app.app_context():
+        assert Show.query.count() == VENUES * ARTISTS + 2
+        assert Show.query.filter_by(artist_id=2, venue_id=4).filter(Show.duration_minutes == 90).count() == 1
+        # the counters of both sides follow the import
+        assert Artist.query.get(1).upcoming_shows_count == 1
+        assert Venue.query.get(3).upcoming_shows_count == 5
+
+
+def test_exports_stream_every_row_and_import_again_as_clashes(app, client, tmp_path):
+    path = tmp_path / 'venues.csv'
+    result = run(app, 'export', 'venues', '-o', path)
+    assert result.exit_code == 0
+    assert f'exported {VENUES} venues' in result.output
+
+    with path.open(newline='') as stream:
+        rows = list(csv.DictReader(stream))
+    assert [row['name'] for row in rows] == [f'The Venue {n}' for n in range(1, VENUES + 1)]
+    assert rows[0]['genres'] == 'Jazz,Folk'
+
+    result = run(app, 'export', 'shows', '-o', tmp_path / 'shows.jsonl')
+    assert result.exit_code == 0
+    shows = [json.loads(line) for line in (tmp_path / 'shows.jsonl').read_text().splitlines()]
+    assert len(shows) == VENUES * ARTISTS
+    assert [show['id'] for show in shows] == sorted(show['id'] for show in shows)
+
+    # the exported shows are all booked already
+    result = run(app, 'import', 'shows', tmp_path / 'shows.jsonl')
+    assert result.exit_code == 0
+    assert 'imported 0 shows in' in result.output
+    assert f'rejected {VENUES * ARTISTS}' in result.output
@@ -0,0 +1,68 @@
+import cache
+from conftest import VENUES
+
+NEW_VENUE = {'name': 'The Newest Venue', 'city': 'San Francisco', 'state': 'CA', 'address': '9 Main Street',
+             'phone': '123-123-1234', 'genres': ['Jazz'], 'website': 'https://example.com',
+             'facebook_link': 'https://www.facebook.com/example'}
+
+
+def outcomes(endpoint):
+    return cache.stats[endpoint + '.hits'], cache.stats[endpoint + '.misses']
+
+
+def test_repeated_page_is_served_from_the_cache(client):
+    hits, misses = outcomes('main.venues')
+    first = client.get('/venues').data
+    assert outcomes('main.venues') == (hits, misses + 1)
+    assert client.get('/venues').data == first
+    assert outcomes('main.venues') == (hits + 1, misses + 1)
+
+
+def test_query_string_is_part_of_the_key(client):
+    hits, misses = outcomes('main.shows')
+    client.get('/shows')
+    client.get('/shows?from=2000-01-01')
+    assert outcomes('main.shows') == (hits, misses + 2)
+
+
+def test_created_venue_is_listed_at_once(client):
+    assert b'The Newest Venue' not in client.get('/venues').data
+    assert b'The Newest Venue' not in client.get('/').data
+    client.post('/venues/create', data=NEW_VENUE)
+    assert b'The Newest Venue' in client.get('/venues').data
+    assert b'The Newest Venue' in client.get('/').data
+
+
+def test_edited_artist_is_shown_at_once(client):
+    assert b'Renamed Band' not in client.get('/').data
+    client.post('/artists/8/edit', data={'name': 'Renamed Band', 'city': 'San Francisco', 'state': 'CA',
+                                         'phone': '326-123-5000', 'genres': ['Jazz']})
+    # the first page after the redirect shows the flash message and bypasses the cache
+    client.get('/')
+    assert b'Renamed Band' in client.get('/').data
+
+
+def test_deleted_venue_leaves_the_listing(client):
+    client.post('/venues/create', data=NEW_VENUE)
+    assert b'The Newest Venue' in client.get('/venues').data
+    client.post(f'/venues/{VENUES + 1}/delete')
+    assert b'The Newest Venue' not in client.get('/venues').data
+
+
+def test_pages_with_flash_messages_bypass_the_cache(client):
+    client.get('/')
+    with client.session_transaction() as session:
+        session['_flashes'] = [('alert-success', 'Welcome back!')]
+    hits, misses = outcomes('main.index')
+    response = client.get('/')
+    assert b'Welcome back!' in response.data
+    assert response.headers['Cache-Control'] == 'private, no-store'
+    assert outcomes('main.index') == (hits, misses)
+
+
+def test_stats_count_invalidations(client):
+    invalidations = cache.stats['venues.invalidations']
+    client.post('/venues/create', data=NEW_VENUE)
+    stats = client.get('/cache/stats').get_json()
+    assert stats['backend'] == 'LRUCache'
+    assert stats['counters']['venues.invalidations'] == invalidations + 1
@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+
+import counters
+from models import db, Venue, Artist
+
+
+def first_show_time():
+    # the seeded venue 1 gets the earliest upcoming show, an hour from the current hour
+    return datetime.now().replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+
+
+def counter(app, model, row_id):
+    with app.app_context():
+        row = model.query.get(row_id)
+        return row.upcoming_shows_count, row.next_show_time
+
+
+def test_seeded_counters_count_upcoming_shows_only(app, client):
+    assert counter(app, Venue, 1) == (4, first_show_time())
+    assert counter(app, Artist, 5) == (4, first_show_time())
+    assert counter(app, Artist, 1) == (0, None)
+
+
+def test_booking_refreshes_the_counters_of_both_sides(app, client):
+    client.post('/shows/create', data={'artist_id': 1, 'venue_id': 1, 'start_time': '2030-01-01 20:00:00'})
+    assert counter(app, Venue, 1) == (5, first_show_time())
+    assert counter(app, Artist, 1) == (1, datetime(2030, 1, 1, 20))
+
+
+def test_roll_moves_started_shows_to_the_past(app, client):
+    with app.app_context():
+        rolled = counters.roll(first_show_time() + timedelta(minutes=1))
+        db.session.commit()
+    # venue 1 and artist 5 shared the show that started
+    assert rolled == 2
+    assert counter(app, Venue, 1) == (3, first_show_time() + timedelta(days=1))
+    assert counter(app, Artist, 5) == (3, first_show_time() + timedelta(hours=3))
+    assert counter(app, Venue, 2) == (4, first_show_time() + timedelta(hours=3))
+
+
+def test_check_reports_and_fixes_drift(app, client):
+    with app.app_context():
+        db.session.execute(Venue.__table__.update().where(Venue.id == 2).values(upcoming_shows_count=99))
+        db.session.commit()
+        drifted = counters.drift(Venue)
+        assert [(row.id, row.upcoming_shows_count, row.actual_count) for row in drifted] == [(2, 99, 4)]
+        assert counters.drift(Artist) == []
+
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['counters', 'check'])
+    assert result.exit_code == 1
+    assert 'venues 2: 99 upcoming shows, actually 4' in result.output
+
+    result = runner.invoke(args=['counters', 'check', '--fix'])
+    assert result.exit_code == 0
+    assert 'fixed 1 drifted counters' in result.output
+    assert counter(app, Venue, 2)[0] == 4
+    assert runner.invoke(args=['counters', 'check']).exit_code == 0
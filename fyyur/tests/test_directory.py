@@ -0,0 +1,55 @@
+from models import db, AreaDirectory
+
+OAKLAND_VENUE = {'name': 'The Oakland Venue', 'city': 'Oakland', 'state': 'CA', 'address': '9 Main Street',
+                 'phone': '123-123-1234', 'genres': ['Jazz'], 'website': 'https://example.com',
+                 'facebook_link': 'https://www.facebook.com/example'}
+
+
+def areas(app):
+    # (state, city): (venue ids in listing order, venue count, upcoming show count)
+    with app.app_context():
+        return {(row.state, row.city): ([venue['id'] for venue in row.venues], row.venue_count,
+                                        row.upcoming_shows_count) for row in AreaDirectory.query}
+
+
+def test_seeded_venues_are_grouped_by_area(app, client):
+    assert areas(app) == {
+        ('CA', 'San Francisco'): ([2, 4], 2, 8),
+        ('NY', 'New York'): ([1, 3], 2, 8),
+    }
+
+
+def test_new_area_is_listed_and_dropped_with_its_last_venue(app, client):
+    client.post('/venues/create', data=OAKLAND_VENUE)
+    assert areas(app)[('CA', 'Oakland')] == ([5], 1, 0)
+    assert b'The Oakland Venue' in client.get('/venues').data
+
+    client.post('/venues/5/delete')
+    assert ('CA', 'Oakland') not in areas(app)
+    assert b'Oakland' not in client.get('/venues').data
+
+
+def test_moved_venue_is_regrouped_in_both_areas(app, client):
+    client.post('/venues/1/edit', data=dict(OAKLAND_VENUE, name='The Venue 1', city='San Francisco'))
+    assert areas(app) == {
+        ('CA', 'San Francisco'): ([1, 2, 4], 3, 12),
+        ('NY', 'New York'): ([3], 1, 4),
+    }
+
+
+def test_booked_show_updates_the_area_count(app, client):
+    client.post('/shows/create', data={'artist_id': 1, 'venue_id': 3, 'start_time': '2030-01-01 20:00:00'})
+    assert areas(app)[('NY', 'New York')] == ([1, 3], 2, 9)
+
+
+def test_refresh_command_rebuilds_every_area(app, client):
+    expected = areas(app)
+    with app.app_context():
+        db.session.execute(AreaDirectory.__table__.delete())
+        db.session.add(AreaDirectory(state='CA', city='Nowhere', venues=[], venue_count=0, upcoming_shows_count=0))
+        db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['directory', 'refresh'])
+    assert result.exit_code == 0
+    assert 'refreshed 2 areas' in result.output
+    assert areas(app) == expected
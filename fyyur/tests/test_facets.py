@@ -0,0 +1,61 @@
+import pytest
+
+from models import db, Artist
+
+
+@pytest.fixture
+def varied(app, client):
+    # artist 1 also plays rock and looks for venues, artist 2 plays blues in New York
+    with app.app_context():
+        table = Artist.__table__
+        db.session.execute(table.update().where(table.c.id == 1).
+                           values(genres=['Rock n Roll', 'Jazz'], seeking_venue=True))
+        db.session.execute(table.update().where(table.c.id == 2).
+                           values(genres=['Blues'], state='NY', city='New York'))
+        db.session.commit()
+    return client
+
+
+def listing(client, path, **args):
+    page = client.get(path, query_string=dict(args, facets='1')).get_json()
+    return {row['id'] for row in page['data']}, page['facets']
+
+
+def test_facets_count_every_value(varied):
+    ids, facets = listing(varied, '/api/artists')
+    assert ids == set(range(1, 9))
+    assert facets == {
+        'genre': {'Jazz': 7, 'Blues': 1, 'Rock n Roll': 1},
+        'state': {'CA': 7, 'NY': 1},
+        'city': {'San Francisco': 7, 'New York': 1},
+        'seeking_venue': {'false': 7, 'true': 1},
+    }
+
+
+def test_facets_count_the_filtered_rows(varied):
+    ids, facets = listing(varied, '/api/artists', genre='Jazz', state='CA')
+    assert ids == {1, 3, 4, 5, 6, 7, 8}
+    assert facets['genre'] == {'Jazz': 7, 'Rock n Roll': 1}
+    assert facets['seeking_venue'] == {'false': 6, 'true': 1}
+
+
+def test_genre_filters_combine(varied):
+    assert listing(varied, '/api/artists', genre=['Jazz', 'Rock n Roll'])[0] == {1}
+    assert listing(varied, '/api/artists', genre=['Jazz', 'Blues'])[0] == set()
+    assert listing(varied, '/api/artists', seeking_venue='true')[0] == {1}
+
+
+def test_venue_facets(client):
+    ids, facets = listing(client, '/api/venues', state='CA')
+    assert ids == {2, 4}
+    assert facets == {
+        'genre': {'Jazz': 2, 'Folk': 2},
+        'state': {'CA': 2},
+        'city': {'San Francisco': 2},
+        'seeking_talent': {'false': 2},
+    }
+
+
+@pytest.mark.parametrize('args', [{'genre': 'Polka'}, {'state': 'XX'}, {'seeking_venue': 'maybe'}])
+def test_filters_that_cannot_match_are_rejected(client, args):
+    assert client.get('/api/artists', query_string=args).status_code == 400
@@ -0,0 +1,86 @@
+import query_budget
+from conftest import ARTISTS
+from models import db, Venue, Artist
+
+
+def write_elsewhere(app, statement):
+    # what another worker or a CLI process does: its cache.invalidate() never
+    # reaches this process's LRU backend
+    with app.app_context():
+        db.session.execute(statement)
+        db.session.commit()
+
+
+def add_artist(app, artist_id, name):
+    write_elsewhere(app, Artist.__table__.insert().values(id=artist_id, name=name, city='Oakland', state='CA',
+                                                          phone='326-123-5000', genres=['Jazz']))
+
+
+def test_revalidated_page_runs_only_the_version_statement(client):
+    etag = client.get('/shows').headers['ETag']
+    with client:
+        response = client.get('/shows', headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert query_budget.query_count() == 1
+
+
+def test_write_from_another_process_changes_the_etag(app, client):
+    etag = client.get('/artists').headers['ETag']
+    add_artist(app, ARTISTS + 1, 'Newcomer Quartet')
+
+    response = client.get('/artists', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert b'Newcomer Quartet' in response.data
+    assert response.headers['ETag'] != etag
+
+
+def test_delete_from_another_process_changes_the_etag(app, client):
+    # deleting an older row leaves max(updated_at) where it was
+    add_artist(app, ARTISTS + 1, 'Short Lived Trio')
+    add_artist(app, ARTISTS + 2, 'Newcomer Quartet')
+    etag = client.get('/artists').headers['ETag']
+    write_elsewhere(app, Artist.__table__.delete().where(Artist.id == ARTISTS + 1))
+
+    response = client.get('/artists', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert b'Short Lived Trio' not in response.data
+
+
+def test_cached_page_follows_writes_from_another_process(app, client):
+    assert b'The Venue 9' not in client.get('/').data
+    write_elsewhere(app, Venue.__table__.insert().values(id=9, name='The Venue 9', city='Oakland', state='CA',
+                                                         address='9 Main Street', phone='123-123-1234',
+                                                         genres=['Jazz']))
+    assert b'The Venue 9' in client.get('/').data
+
+
+def test_unchanged_tables_keep_the_etag(client):
+    etag = client.get('/api/venues').headers['ETag']
+    assert client.get('/api/artists').status_code == 200
+    assert client.get('/api/venues', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_show_booked_through_the_site_changes_the_detail_etags(client):
+    venue_etag = client.get('/venues/1').headers['ETag']
+    artist_etag = client.get('/artists/2').headers['ETag']
+    other_etag = client.get('/artists/3').headers['ETag']
+    client.post('/shows/create', data={'artist_id': 2, 'venue_id': 1, 'start_time': '2030-01-01 20:00:00'})
+
+    assert client.get('/venues/1', headers={'If-None-Match': venue_etag}).status_code == 200
+    assert client.get('/artists/2', headers={'If-None-Match': artist_etag}).status_code == 200
+    # a detail page depends on whole tables, so other artists' pages change too
+    assert client.get('/artists/3', headers={'If-None-Match': other_etag}).status_code == 200
+
+
+def test_unchanged_page_answers_if_modified_since(client):
+    last_modified = client.get('/venues').headers['Last-Modified']
+    assert client.get('/venues', headers={'If-Modified-Since': last_modified}).status_code == 304
+
+
+def test_cache_control_is_set_per_endpoint(client):
+    assert client.get('/artists').headers['Cache-Control'] == 'public, no-cache'
+    assert client.get('/api/artists').headers['Cache-Control'] == 'public, max-age=60'
+    etag = client.get('/api/artists').headers['ETag']
+    assert client.get('/api/artists', headers={'If-None-Match': etag}).headers['Cache-Control'] == \
+        'public, max-age=60'
+    assert 'ETag' not in client.get('/venues/999').headers
@@ -0,0 +1,13 @@
+import replicas
+
+
+def test_replica_that_cannot_be_checked_leaves_rotation(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'SQLALCHEMY_BINDS', {'replica_1': 'nosuchdialect://replica/fyyur'})
+    monkeypatch.setitem(app.config, 'REPLICA_BINDS', ['replica_1'])
+    monkeypatch.setattr(replicas, 'health', {})
+    with app.app_context():
+        replicas.check_replicas(app)
+        assert replicas.healthy_replicas() == []
+    status = replicas.health['replica_1']
+    assert status['healthy'] is False
+    assert status['error'].startswith('NoSuchModuleError')
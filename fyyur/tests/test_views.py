@@ -0,0 +1,191 @@
+from datetime import datetime, timedelta
+
+import pytest
+from flask import request
+
+import booking
+import query_budget
+from conftest import ARTISTS, VENUES
+from models import Artist, Show
+from search import TrigramIndex
+
+# every listing, detail, search and API page of the seeded data
+PAGES = [
+    '/',
+    '/venues',
+    '/venues/1',
+    '/venues/2?past_page=1',
+    '/venues/search?search_term=venue',
+    '/artists',
+    '/artists/1',
+    '/artists/search?search_term=band',
+    '/shows',
+    '/shows?from=2000-01-01',
+    '/shows/search?search_term=venue',
+    '/api/venues',
+    '/api/venues?facets=1',
+    '/api/artists',
+    '/api/artists?facets=1',
+    '/api/shows',
+]
+
+
+# ----------------------------------------------------------------------------#
+# Query budgets.
+# ----------------------------------------------------------------------------#
+
+@pytest.mark.parametrize('path', PAGES)
+def test_page_stays_within_its_query_budget(app, client, path):
+    with client:
+        response = client.get(path)
+        assert response.status_code == 200
+        budget = app.view_functions[request.endpoint].query_budget
+        assert 0 < query_budget.query_count() <= budget
+
+
+def test_going_over_budget_fails(app, client, monkeypatch):
+    monkeypatch.setattr(app.view_functions['main.show_venue'], 'query_budget', 1)
+    with pytest.raises(query_budget.QueryBudgetExceeded):
+        client.get('/venues/1')
+
+
+def test_lazy_loaded_shows_fail_the_budget(app, client, monkeypatch):
+    # one query per artist on the venue page is the N+1 the budget is there for
+    monkeypatch.setitem(app.config, 'SHOW_LOADING_STRATEGY', 'select')
+    with pytest.raises(query_budget.QueryBudgetExceeded):
+        client.get('/venues/1')
+
+
+# ----------------------------------------------------------------------------#
+# Trigram search fallback.
+# ----------------------------------------------------------------------------#
+
+def test_trigram_index_matches_substrings_best_first():
+    index = TrigramIndex([(1, 'The Musical Hop'), (2, 'Hop'), (3, 'Park Square Live Music & Coffee')])
+    assert index.search('hop', 0, 10) == (2, [(2, 'Hop'), (1, 'The Musical Hop')])
+    assert index.search('musi', 0, 10)[0] == 2
+    assert index.search('jazz', 0, 10) == (0, [])
+
+
+def test_trigram_index_pages_and_forgets_removed_rows():
+    index = TrigramIndex((number, f'Band {number}') for number in range(1, 6))
+    total, rows = index.search('band', 2, 2)
+    assert total == 5
+    assert rows == [(3, 'Band 3'), (4, 'Band 4')]
+    index.remove(3)
+    index.add(4, 'Quartet')
+    assert index.search('band', 0, 10) == (3, [(1, 'Band 1'), (2, 'Band 2'), (5, 'Band 5')])
+
+
+# ----------------------------------------------------------------------------#
+# Keyset pagination.
+# ----------------------------------------------------------------------------#
+
+def walk(client, path, **args):
+    rows, cursor = [], None
+    while True:
+        page = client.get(path, query_string=dict(args, **({'cursor': cursor} if cursor else {}))).get_json()
+        rows += page['data']
+        cursor = page['next_cursor']
+        if cursor is None:
+            return rows
+
+
+def test_artist_cursor_visits_every_artist_once_by_name(client):
+    artists = walk(client, '/api/artists', limit=3)
+    assert [artist['name'] for artist in artists] == sorted(artist['name'] for artist in artists)
+    assert sorted(artist['id'] for artist in artists) == list(range(1, ARTISTS + 1))
+
+
+def test_show_cursor_visits_every_show_once_by_start_time(client):
+    shows = walk(client, '/api/shows', limit=5, **{'from': '2000-01-01'})
+    assert len(shows) == len({show['id'] for show in shows}) == ARTISTS * VENUES
+    assert [show['start_time'] for show in shows] == sorted(show['start_time'] for show in shows)
+
+
+def test_tampered_cursor_is_rejected(client):
+    assert client.get('/api/artists', query_string={'cursor': 'not-a-cursor'}).status_code == 400
+
+
+# ----------------------------------------------------------------------------#
+# Double-booking.
+# ----------------------------------------------------------------------------#
+
+def form_time(time):
+    return time.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def test_conflicts_finds_booked_artists_and_venues(app, client):
+    with app.app_context():
+        booked = Show.query.filter_by(venue_id=1, artist_id=1).one()
+        start = booked.start_time
+        later = start + timedelta(days=30)
+        clashes = booking.conflicts({
+            'same venue': {"artist_id": 2, "venue_id": 1, "start_time": start + timedelta(hours=1),
+                           "duration_minutes": 60},
+            'same artist': {"artist_id": 1, "venue_id": 2, "start_time": start - timedelta(minutes=30),
+                            "duration_minutes": 60},
+            'right after': {"artist_id": 1, "venue_id": 1, "start_time": start + timedelta(minutes=120),
+                            "duration_minutes": 60},
+            'first of batch': {"artist_id": 3, "venue_id": 3, "start_time": later, "duration_minutes": 60},
+            'clashes with batch': {"artist_id": 4, "venue_id": 3, "start_time": later + timedelta(minutes=30),
+                                   "duration_minutes": 60},
+        })
+    assert clashes == {
+        'same venue': booking.VENUE_BOOKED,
+        'same artist': booking.ARTIST_BOOKED,
+        'clashes with batch': booking.VENUE_BOOKED,
+    }
+
+
+def test_rejected_show_does_not_block_the_rest_of_its_batch(app, client):
+    with app.app_context():
+        start = Show.query.filter_by(venue_id=1, artist_id=1).one().start_time
+        clashes = booking.conflicts({
+            'rejected': {"artist_id": 2, "venue_id": 1, "start_time": start, "duration_minutes": 60},
+            'overlaps only the rejected show': {"artist_id": 2, "venue_id": 2,
+                                                "start_time": start + timedelta(minutes=30),
+                                                "duration_minutes": 60},
+        })
+    assert clashes == {'rejected': booking.VENUE_BOOKED}
+
+
+def test_double_booked_show_is_refused(app, client):
+    with app.app_context():
+        start = Show.query.filter_by(venue_id=1, artist_id=1).one().start_time
+    response = client.post('/shows/create', data={
+        'artist_id': 2, 'venue_id': 1, 'start_time': form_time(start + timedelta(hours=1))})
+    assert response.status_code == 409
+    with app.app_context():
+        assert Show.query.count() == ARTISTS * VENUES
+
+
+def test_show_is_created(app, client):
+    response = client.post('/shows/create', data={
+        'artist_id': 2, 'venue_id': 1, 'start_time': form_time(datetime.now() + timedelta(days=60))})
+    assert response.status_code == 200
+    with app.app_context():
+        assert Show.query.count() == ARTISTS * VENUES + 1
+
+
+# ----------------------------------------------------------------------------#
+# Optimistic locking.
+# ----------------------------------------------------------------------------#
+
+def test_stale_edit_is_sent_back_to_the_form(app, client):
+    with app.app_context():
+        version = Artist.query.get(1).version
+    form = {'name': 'Renamed', 'city': 'San Francisco', 'state': 'CA', 'phone': '326-123-5000',
+            'genres': ['Jazz'], 'version': version}
+
+    response = client.post('/artists/1/edit', data=form)
+    assert response.status_code == 302
+    assert response.location.endswith('/artists/1')
+
+    # a second form rendered from the same version lost the race
+    response = client.post('/artists/1/edit', data=dict(form, name='Lost update'))
+    assert response.status_code == 302
+    assert response.location.endswith('/artists/1/edit')
+    with app.app_context():
+        assert Artist.query.get(1).name == 'Renamed'
+        assert Artist.query.get(1).version == version + 1
@@ -0,0 +1,816 @@
+# ----------------------------------------------------------------------------#
+# Imports
+# ----------------------------------------------------------------------------#
+
+from datetime import datetime, timedelta
+from sqlalchemy import desc, func, and_, or_, not_, case
+from sqlalchemy.orm import joinedload, lazyload, selectinload
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
+from flask import Blueprint, current_app, render_template, request, flash, redirect, url_for, abort, jsonify
+from werkzeug.datastructures import MultiDict
+from forms import *
+from models import db, Venue, Artist, Show, AreaDirectory
+from search import search
+from pagination import keyset_page
+from streaming import StreamedRows, stream_template, streaming_requested
+import booking
+import cache
+import counters
+import directory
+import facets
+import http_cache
+import query_budget
+
+bp = Blueprint('main', __name__)
+
+
+def show_loader_options(*relationships):
+    # how the artist/venue of a list of shows is fetched; lazy loading issues one
+    # query per show, so the listing and detail pages load them up front
+    strategy = {
+        'joined': joinedload,
+        'selectin': selectinload,
+        'select': lazyload
+    }[current_app.config['SHOW_LOADING_STRATEGY']]
+    return [strategy(relationship) for relationship in relationships or (Show.artist, Show.venue)]
+
+
+def partitioned_shows(owner_column, owner_id, related, past_page=1):
+    # one round trip returns a venue's or artist's shows split at a single `now`:
+    # the soonest upcoming shows and one page of the most recent past shows, each
+    # row carrying the total of its side
+    now = datetime.now()
+    per_page = current_app.config['DETAIL_SHOWS_PER_PAGE']
+    past_page = max(past_page, 1)
+    upcoming = Show.start_time >= now
+
+    # upcoming shows rank by ascending start time, past shows by descending start time
+    ranked = db.session.query(
+        Show.id.label('id'),
+        upcoming.label('upcoming'),
+        func.row_number().over(
+            partition_by=upcoming,
+            order_by=(case([(upcoming, Show.start_time)]), Show.start_time.desc())
+        ).label('position'),
+        func.count(Show.id).over(partition_by=upcoming).label('total')
+    ).filter(owner_column == owner_id).subquery()
+
+    rows = db.session.query(Show, ranked.c.upcoming, ranked.c.total). \
+        join(ranked, ranked.c.id == Show.id). \
+        options(*show_loader_options(related)). \
+        filter(or_(
+            and_(ranked.c.upcoming, ranked.c.position <= per_page),
+            and_(not_(ranked.c.upcoming),
+                 ranked.c.position.between((past_page - 1) * per_page + 1, past_page * per_page))
+        )). \
+        order_by(ranked.c.upcoming.desc(), ranked.c.position).all()
+
+    shows = {
+        "upcoming_shows": [],
+        "upcoming_shows_count": 0,
+        "past_shows": [],
+        "past_shows_count": 0,
+        "past_page": past_page
+    }
+    for show, is_upcoming, total in rows:
+        side = 'upcoming_shows' if is_upcoming else 'past_shows'
+        shows[side].append(show)
+        shows[side + '_count'] = total
+    if past_page > 1 and not shows["past_shows"]:
+        abort(404)
+    shows["has_more_past_shows"] = past_page * per_page < shows["past_shows_count"]
+    return shows
+
+
+def upcoming_show_previews(model, owner_column, ids):
+    # one query returns the given venues or artists, in the order of `ids`, with
+    # their upcoming show count and the first few upcoming shows
+    if not ids:
+        return []
+    now = datetime.now()
+    upcoming = db.session.query(
+        owner_column.label('owner_id'),
+        Show.start_time.label('start_time'),
+        Show.artist_id.label('artist_id'),
+        func.row_number().over(partition_by=owner_column, order_by=(Show.start_time, Show.id)).label('position')
+    ).filter(owner_column.in_(ids), Show.start_time > now).subquery()
+
+    rows = db.session.query(model.id, model.name, model.image_link,
+                            model.upcoming_shows_count, upcoming.c.start_time, upcoming.c.artist_id). \
+        outerjoin(upcoming, and_(upcoming.c.owner_id == model.id,
+                                 upcoming.c.position <= current_app.config['SEARCH_SHOW_PREVIEWS'])). \
+        filter(model.id.in_(ids)). \
+        order_by(model.id, upcoming.c.position).all()
+
+    data = {}
+    for row in rows:
+        entry = data.setdefault(row.id, {
+            "id": row.id,
+            "name": row.name,
+            "image_link": row.image_link,
+            "num_upcoming_shows": row.upcoming_shows_count,
+            "upcoming_shows": []
+        })
+        if row.start_time is not None:
+            entry["upcoming_shows"].append({
+                "start_time": row.start_time,
+                "artist_id": row.artist_id
+            })
+    return [data[row_id] for row_id in ids if row_id in data]
+
+
+def page_size():
+    size = request.args.get('limit', current_app.config['LISTING_PAGE_SIZE'], type=int)
+    return min(max(size, 1), current_app.config['LISTING_MAX_PAGE_SIZE'])
+
+
+def artists_page(filters=None):
+    # artists as (id, name) rows, in name order
+    return keyset_page(facets.apply_filters(db.session.query(Artist.id, Artist.name), Artist, filters or {}),
+                       [Artist.name, Artist.id], [str, int],
+                       request.args.get('cursor'), page_size())
+
+
+def venues_page(filters=None):
+    # venues in area order, like the /venues listing
+    query = db.session.query(Venue.id, Venue.name, Venue.city, Venue.state, Venue.upcoming_shows_count)
+    return keyset_page(facets.apply_filters(query, Venue, filters or {}),
+                       [Venue.state, Venue.city, Venue.id], [str, str, int],
+                       request.args.get('cursor'), page_size())
+
+
+def show_filters(args):
+    # the date window and venue location of the shows listings, aborting with 400 on
+    # a value that cannot match; a `to` date without a time includes that whole day
+    filters = {}
+    for name in ('from', 'to'):
+        if args.get(name):
+            try:
+                filters[name] = datetime.fromisoformat(args[name])
+            except ValueError:
+                abort(400, f'{name} must be an ISO 8601 date or time')
+    if 'to' in filters and len(args['to']) == len('YYYY-MM-DD'):
+        filters['to'] += timedelta(days=1)
+    if 'from' in filters and 'to' in filters and filters['to'] <= filters['from']:
+        abort(400, 'to must be after from')
+    if args.get('state'):
+        if args['state'] not in facets.STATES:
+            abort(400, 'unknown state')
+        filters['state'] = args['state']
+    if args.get('city'):
+        filters['city'] = args['city']
+    return filters
+
+
+def shows_query(filters=None):
+    # upcoming shows, or those of the date window in `filters`, as flat rows carrying
+    # the artist and venue fields the listings show
+    filters = filters or {}
+    query = db.session.query(Show.id, Show.start_time, Show.artist_id, Show.venue_id,
+                             Artist.name.label('artist_name'), Artist.image_link.label('artist_image_link'),
+                             Venue.name.label('venue_name')). \
+        join(Artist, Show.artist_id == Artist.id). \
+        join(Venue, Show.venue_id == Venue.id)
+    if 'from' in filters:
+        query = query.filter(Show.start_time >= filters['from'])
+    else:
+        query = query.filter(Show.start_time > datetime.now())
+    if 'to' in filters:
+        query = query.filter(Show.start_time < filters['to'])
+    if 'state' in filters:
+        query = query.filter(Venue.state == filters['state'])
+    if 'city' in filters:
+        query = query.filter(Venue.city == filters['city'])
+    return query
+
+
+def shows_page(filters=None):
+    return keyset_page(shows_query(filters), [Show.start_time, Show.id], [datetime.fromisoformat, int],
+                       request.args.get('cursor'), page_size())
+
+
+def api_page(data, next_cursor, **extra):
+    return jsonify({"data": data, "next_cursor": next_cursor, **extra})
+
+
+def changed_columns(record, columns, flags):
+    # the submitted values that differ from the record, so the UPDATE writes only
+    # those columns; a field missing from the form is left alone, except checkboxes,
+    # which browsers leave out when they are unchecked
+    changes = {}
+    for column in columns:
+        if column in flags:
+            value = column in request.form
+        elif column not in request.form:
+            continue
+        elif column == 'genres':
+            value = request.form.getlist(column)
+        else:
+            value = request.form[column]
+        if getattr(record, column) != value:
+            changes[column] = value
+    return changes
+
+
+def edited_concurrently(record):
+    # the edit form carries the version it was rendered from
+    return request.form.get('version', record.version, type=int) != record.version
+
+
+# ----------------------------------------------------------------------------#
+# Controllers.
+# ----------------------------------------------------------------------------#
+
+
+@bp.route('/')
+@query_budget.limit(3)
+@http_cache.conditional('venues', 'artists')
+@cache.cached_page('venues', 'artists')
+def index():
+    new_venues = Venue.query.order_by(desc('id')).limit(10).all()
+    new_artists = Artist.query.order_by(desc('id')).limit(10).all()
+
+    return render_template('pages/home.html', new_venues=new_venues, new_artists=new_artists)
+
+
+#  Venues
+#  -------------------------------------------------------------------------- #
+
+@bp.route('/venues')
+@query_budget.limit(2)
+@http_cache.conditional('venues', 'shows')
+@cache.cached_page('venues', 'shows')
+def venues():
+    # areas come pre-grouped from the area directory, in (state, city) order
+    areas = AreaDirectory.query.order_by(AreaDirectory.state, AreaDirectory.city)
+    if streaming_requested():
+        rows = StreamedRows(areas)
+        return stream_template('pages/venues.html', rows, areas=rows, page=1, has_next=False)
+
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = current_app.config['VENUE_AREAS_PER_PAGE']
+    # the extra area only tells us whether a next page exists
+    data = areas.offset((page - 1) * per_page).limit(per_page + 1).all()
+    has_next = len(data) > per_page
+
+    return render_template('pages/venues.html', areas=data[:per_page], page=page, has_next=has_next)
+
+
+@bp.route('/venues/search', methods=['GET', 'POST'])
+@query_budget.limit(1)
+def search_venues():
+    search_term = request.values.get('search_term', '')
+    page = request.args.get('page', 1, type=int)
+    venue_results = search(Venue, search_term, page, current_app.config['SEARCH_RESULTS_PER_PAGE'])
+
+    data = []
+    for venue_id, name in venue_results.items:
+        data.append({
+            "id": venue_id,
+            "name": name
+        })
+    results = {
+        "count": venue_results.total,
+        "data": data,
+        "page": venue_results.page,
+        "has_next": venue_results.page * venue_results.per_page < venue_results.total
+    }
+    return render_template('pages/search_venues.html', results=results, search_term=search_term)
+
+
+@bp.route('/venues/<int:venue_id>')
+@query_budget.limit(6)
+@http_cache.conditional('venues', 'shows', 'artists', clock=True)
+def show_venue(venue_id):
+    venue = Venue.query.get_or_404(venue_id)
+    shows = partitioned_shows(Show.venue_id, venue_id, Show.artist, request.args.get('past_page', 1, type=int))
+
+    data = {
+        "id": venue.id,
+        "name": venue.name,
+        "genres": venue.genres,
+        "city": venue.city,
+        "state": venue.state,
+        "address": venue.address,
+        "phone": venue.phone,
+        "website": venue.website,
+        "facebook_link": venue.facebook_link,
+        "seeking_venue": venue.seeking_talent,
+        "seeking_description": venue.seeking_description,
+        "image_link": venue.image_link,
+        **shows
+    }
+
+    artist_search_term = request.args.get('artist_search_term', '')
+    artist_results = search(Artist, artist_search_term, per_page=current_app.config['SEARCH_RESULTS_PER_PAGE'])
+    artist_data = []
+    for artist_id, name in artist_results.items:
+        artist_data.append({
+            "id": artist_id,
+            "name": name
+        })
+    results = {
+        "count": artist_results.total,
+        "artist_search_term": artist_search_term,
+        "artist_data": artist_data
+    }
+
+    return render_template('pages/show_venue.html', venue=data, results=results)
+
+
+#  Create Venue
+#  ----------------------------------------------------------------
+
+
+@bp.route('/venues/create', methods=['GET'])
+def create_venue_form():
+    form = VenueForm()
+    return render_template('forms/new_venue.html', form=form)
+
+
+@bp.route('/venues/create', methods=['POST'])
+def create_venue_submission():
+    form = VenueForm(request.form)
+    try:
+        name = request.form.get("name")
+        city = request.form.get("city")
+        state = request.form.get("state")
+        address = request.form.get("address")
+        phone = request.form.get("phone")
+        genres = request.form.getlist("genres")
+        image_link = request.form.get("image_link")
+        website = request.form.get("website")
+        facebook_link = request.form.get("facebook_link")
+        seeking_talent = "seeking_talent" in request.form
+        seeking_description = request.form.get("seeking_description")
+        new_venue = Venue(name=name, city=city, state=state, address=address, phone=phone, genres=genres,
+                          image_link=image_link, website=website, facebook_link=facebook_link,
+                          seeking_talent=seeking_talent, seeking_description=seeking_description)
+        db.session.add(new_venue)
+        db.session.flush()
+        directory.refresh_areas([(state, city)])
+        db.session.commit()
+        cache.invalidate('venues')
+        flash(('The venue ' + request.form['name'] + ' was successfully listed!'), 'alert-success')
+    except:
+        flash(('An error occurred. The venue ' + request.form['name'] + ' could not be listed.'), 'alert-danger')
+        db.session.rollback()
+    finally:
+        db.session.close()
+    return render_template('pages/home.html')
+
+
+@bp.route('/venues/<int:venue_id>/delete', methods=['POST'])
+def delete_venue(venue_id):
+    try:
+        venue = Venue.query.get(venue_id)
+        area = (venue.state, venue.city)
+        artist_ids = [artist_id for artist_id, in
+                      db.session.query(Show.artist_id).filter(Show.venue_id == venue_id).distinct()]
+        db.session.delete(venue)
+        db.session.flush()
+        counters.refresh(Artist, artist_ids)
+        directory.refresh_areas([area])
+        db.session.commit()
+        cache.invalidate('venues')
+        flash('Success! The venue has been deleted.', 'alert-success')
+    except:
+        flash('An error occurred. The venue could not be deleted.', 'alert-danger')
+        db.session.rollback()
+    finally:
+        db.session.close()
+    return render_template('pages/home.html')
+
+
+#  Artists
+#  ----------------------------------------------------------------
+
+
+@bp.route('/artists')
+@query_budget.limit(2)
+@http_cache.conditional('artists')
+def artists():
+    if streaming_requested():
+        rows = StreamedRows(db.session.query(Artist.id, Artist.name).order_by(Artist.name, Artist.id))
+        return stream_template('pages/artists.html', rows, artists=rows, next_cursor=None)
+
+    artist_rows, next_cursor = artists_page()
+    return render_template('pages/artists.html', artists=artist_rows, next_cursor=next_cursor)
+
+
+@bp.route('/artists/search', methods=['GET', 'POST'])
+@query_budget.limit(1)
+def search_artists():
+    search_term = request.values.get('search_term', '')
+    page = request.args.get('page', 1, type=int)
+    artist_results = search(Artist, search_term, page, current_app.config['SEARCH_RESULTS_PER_PAGE'])
+    data = []
+    for artist_id, name in artist_results.items:
+        data.append({
+            "id": artist_id,
+            "name": name
+        })
+    results = {
+        "count": artist_results.total,
+        "data": data,
+        "page": artist_results.page,
+        "has_next": artist_results.page * artist_results.per_page < artist_results.total
+    }
+    return render_template('pages/search_artists.html', results=results, search_term=search_term)
+
+
+@bp.route('/artists/<int:artist_id>')
+@query_budget.limit(4)
+@http_cache.conditional('artists', 'shows', 'venues', clock=True)
+def show_artist(artist_id):
+    artist = Artist.query.get_or_404(artist_id)
+    shows = partitioned_shows(Show.artist_id, artist_id, Show.venue, request.args.get('past_page', 1, type=int))
+
+    data = {
+        "id": artist.id,
+        "name": artist.name,
+        "genres": artist.genres,
+        "city": artist.city,
+        "state": artist.state,
+        "phone": artist.phone,
+        "website": artist.website,
+        "facebook_link": artist.facebook_link,
+        "seeking_venue": artist.seeking_venue,
+        "seeking_description": artist.seeking_description,
+        "image_link": artist.image_link,
+        **shows
+    }
+
+    return render_template('pages/show_artist.html', artist=data)
+
+
+#  Update
+#  ----------------------------------------------------------------
+
+
+@bp.route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+    artist = Artist.query.get_or_404(artist_id)
+    form = ArtistForm(obj=artist)
+    return render_template('forms/edit_artist.html', form=form, artist=artist)
+
+
+@bp.route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+    artist = Artist.query.get_or_404(artist_id)
+    name = artist.name
+    try:
+        if edited_concurrently(artist):
+            raise StaleDataError()
+        changes = changed_columns(artist, ('name', 'city', 'state', 'phone', 'genres', 'image_link', 'website',
+                                           'facebook_link', 'seeking_venue', 'seeking_description'),
+                                  ('seeking_venue',))
+        for column, value in changes.items():
+            setattr(artist, column, value)
+        db.session.commit()
+        if changes:
+            cache.invalidate('artists')
+        flash(('Artist ' + artist.name + ' was successfully edited!'), 'alert-success')
+    except StaleDataError:
+        flash(('Artist ' + name + ' was changed by someone else in the meantime. '
+               'Review the changes and edit again.'), 'alert-danger')
+        db.session.rollback()
+        return redirect(url_for('main.edit_artist', artist_id=artist_id))
+    except:
+        flash(('An error occurred.  Artist: ' + name + ' could not be edited.'), 'alert-danger')
+        db.session.rollback()
+    finally:
+        db.session.close()
+    return redirect(url_for('main.show_artist', artist_id=artist_id))
+
+
+@bp.route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+    venue = Venue.query.get_or_404(venue_id)
+    form = VenueForm(obj=venue)
+    return render_template('forms/edit_venue.html', form=form, venue=venue)
+
+
+@bp.route('/venues/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+    venue = Venue.query.get_or_404(venue_id)
+    name = venue.name
+    try:
+        if edited_concurrently(venue):
+            raise StaleDataError()
+        changes = changed_columns(venue, ('name', 'city', 'state', 'address', 'phone', 'genres', 'image_link',
+                                          'website', 'facebook_link', 'seeking_talent', 'seeking_description'),
+                                  ('seeking_talent',))
+        areas = {(venue.state, venue.city)}
+        for column, value in changes.items():
+            setattr(venue, column, value)
+        if changes.keys() & {'name', 'state', 'city'}:
+            db.session.flush()
+            directory.refresh_areas(areas | {(venue.state, venue.city)})
+        db.session.commit()
+        if changes:
+            cache.invalidate('venues')
+        flash(('The venue ' + venue.name + ' was successfully edited!'), 'alert-success')
+    except StaleDataError:
+        flash(('The venue ' + name + ' was changed by someone else in the meantime. '
+               'Review the changes and edit again.'), 'alert-danger')
+        db.session.rollback()
+        return redirect(url_for('main.edit_venue', venue_id=venue_id))
+    except:
+        flash(('An error occurred. The venue ' + name + ' could not be edited.'), 'alert-danger')
+        db.session.rollback()
+    finally:
+        db.session.close()
+    return redirect(url_for('main.show_venue', venue_id=venue_id))
+
+
+#  Create Artist
+#  ----------------------------------------------------------------
+
+
+@bp.route('/artists/create', methods=['GET'])
+def create_artist_form():
+    form = ArtistForm()
+    return render_template('forms/new_artist.html', form=form)
+
+
+@bp.route('/artists/create', methods=['POST'])
+def create_artist_submission():
+    form = ArtistForm(request.form)
+    try:
+        name = request.form.get('name')
+        city = request.form.get('city')
+        state = request.form.get('state')
+        phone = request.form.get('phone')
+        genres = request.form.getlist('genres')
+        image_link = request.form.get('image_link')
+        website = request.form.get('website')
+        facebook_link = request.form.get('facebook_link')
+        seeking_venue = "seeking_venue" in request.form
+        seeking_description = request.form.get('seeking_description')
+        new_artist = Artist(name=name, city=city, state=state, phone=phone, genres=genres, image_link=image_link,
+                            website=website, facebook_link=facebook_link, seeking_venue=seeking_venue,
+                            seeking_description=seeking_description)
+        db.session.add(new_artist)
+        db.session.commit()
+        cache.invalidate('artists')
+        flash(('Artist ' + request.form['name'] + ' was successfully listed!'), 'alert-success')
+    except:
+        flash(('An error occurred.  Artist: ' + request.form['name'] + ' could not be listed.'), 'alert-danger')
+        db.session.rollback()
+    finally:
+        db.session.close()
+    return render_template('pages/home.html')
+
+
+@bp.route('/artists/<int:artist_id>/delete', methods=['POST'])
+def delete_artist(artist_id):
+    try:
+        artist = Artist.query.get(artist_id)
+        venue_ids = [venue_id for venue_id, in
+                     db.session.query(Show.venue_id).filter(Show.artist_id == artist_id).distinct()]
+        db.session.delete(artist)
+        db.session.flush()
+        counters.refresh(Venue, venue_ids)
+        db.session.commit()
+        cache.invalidate('artists')
+        flash('Success! The artist has been deleted.', 'alert-success')
+    except:
+        flash('An error occurred. The artist could not be deleted.', 'alert-danger')
+        db.session.rollback()
+    finally:
+        db.session.close()
+    return render_template('pages/home.html')
+
+
+#  Shows
+#  ----------------------------------------------------------------
+
+@bp.route('/shows')
+@query_budget.limit(2)
+@http_cache.conditional('shows', 'venues', 'artists', clock=True)
+@cache.cached_page('shows', 'venues', 'artists')
+def shows():
+    # upcoming shows ordered so the next closest upcoming show starts the list and then
+    # as we progress down the list the show dates get farther out
+    filters = show_filters(request.args)
+    # the filters as given, for the pager and the filter form
+    window_args = {name: request.args[name] for name in ('from', 'to', 'state', 'city') if request.args.get(name)}
+    if streaming_requested():
+        rows = StreamedRows(shows_query(filters).order_by(Show.start_time, Show.id))
+        return stream_template('pages/shows.html', rows, shows=rows, next_cursor=None, window_args=window_args,
+                               states=VenueForm.state.kwargs['choices'])
+
+    show_rows, next_cursor = shows_page(filters)
+    return render_template('pages/shows.html', shows=show_rows, next_cursor=next_cursor, window_args=window_args,
+                           states=VenueForm.state.kwargs['choices'])
+
+
+@bp.route('/shows/create', methods=['GET'])
+def create_shows():
+    form = ShowForm()
+    return render_template('forms/new_show.html', form=form)
+
+
+@bp.route('/shows/create', methods=['POST'])
+def create_show_submission():
+    form = ShowForm(request.form)
+    clash = None
+    try:
+        artist_id = request.form.get("artist_id")
+        venue_id = request.form.get("venue_id")
+        # the parsed time; SQLite's DateTime takes nothing else
+        start_time = form.start_time.data
+        duration_minutes = form.duration_minutes.data
+        if not booking.constrained() and start_time:
+            clash = booking.conflicts({None: {"artist_id": int(artist_id), "venue_id": int(venue_id),
+                                              "start_time": start_time,
+                                              "duration_minutes": duration_minutes}}).get(None)
+        if clash is None:
+            new_show = Show(artist_id=artist_id, venue_id=venue_id, start_time=start_time,
+                            duration_minutes=duration_minutes)
+            db.session.add(new_show)
+            db.session.flush()
+            counters.refresh(Venue, [new_show.venue_id])
+            counters.refresh(Artist, [new_show.artist_id])
+            db.session.commit()
+            cache.invalidate('shows')
+            flash('The show was successfully listed!', 'alert-success')
+    except IntegrityError as error:
+        db.session.rollback()
+        clash = booking.violation(error)
+        if clash is None:
+            flash('An error occurred. The show could not be created.', 'alert-danger')
+    except:
+        flash('An error occurred. The show could not be created.', 'alert-danger')
+        db.session.rollback()
+    finally:
+        db.session.close()
+    if clash:
+        form.start_time.errors = [clash]
+        return render_template('forms/new_show.html', form=form), 409
+    return render_template('pages/home.html')
+
+
+@bp.route('/artists/<int:artist_id>/shows/batch', methods=['POST'])
+@query_budget.limit(12)
+def create_artist_shows_batch(artist_id):
+    # books a whole tour at once: {"shows": [{"venue_id": 1, "start_time": "2026-11-01 20:00:00"}, ...]}.
+    # Every row is validated and checked for double-booking before anything is written; the
+    # shows are then inserted in one transaction, or none are and the per-row errors come back
+    payload = request.get_json(silent=True) or {}
+    rows = payload.get('shows') if isinstance(payload, dict) else payload
+    if not isinstance(rows, list) or not rows:
+        return jsonify({"error": "expected a non-empty list of shows"}), 400
+    if len(rows) > current_app.config['SHOW_BATCH_MAX_ROWS']:
+        return jsonify({"error": f"at most {current_app.config['SHOW_BATCH_MAX_ROWS']} shows per batch"}), 400
+    artist = Artist.query.get_or_404(artist_id)
+
+    errors = {}
+    shows = {}
+    for position, row in enumerate(rows):
+        row = row if isinstance(row, dict) else {}
+        form = ShowForm(formdata=MultiDict({
+            "artist_id": str(artist.id),
+            "venue_id": str(row.get("venue_id", "")),
+            "start_time": str(row.get("start_time", "")),
+            "duration_minutes": str(row.get("duration_minutes", ""))
+        }), meta={'csrf': False})
+        if not form.validate():
+            errors[position] = form.errors
+        elif not form.venue_id.data.isdigit():
+            errors[position] = {"venue_id": ["Not a valid venue id."]}
+        else:
+            shows[position] = {"artist_id": artist.id, "venue_id": int(form.venue_id.data),
+                               "start_time": form.start_time.data,
+                               "duration_minutes": form.duration_minutes.data}
+
+    venue_ids = {show["venue_id"] for show in shows.values()}
+    if shows:
+        known_venues = {venue_id for venue_id, in db.session.query(Venue.id).filter(Venue.id.in_(venue_ids))}
+        for position, show in shows.items():
+            if show["venue_id"] not in known_venues:
+                errors[position] = {"venue_id": ["No venue with this id."]}
+        if not booking.constrained():
+            for position, clash in booking.conflicts(shows).items():
+                errors.setdefault(position, {"start_time": [clash]})
+
+    if not errors:
+        try:
+            db.session.bulk_insert_mappings(Show, list(shows.values()))
+            counters.refresh(Venue, venue_ids)
+            counters.refresh(Artist, [artist.id])
+            db.session.commit()
+        except IntegrityError as error:
+            # the exclusion constraints rejected the batch; one query finds the rows that clash
+            db.session.rollback()
+            clash = booking.violation(error)
+            if clash is None:
+                raise
+            errors = {position: {"start_time": [message]} for position, message in booking.conflicts(shows).items()}
+            if not errors:
+                # the show it clashed with was deleted again in the meantime
+                return jsonify({"created": 0, "errors": [], "error": clash}), 409
+        except:
+            db.session.rollback()
+            raise
+
+    if errors:
+        return jsonify({
+            "created": 0,
+            "errors": [{"row": position, "errors": errors[position]} for position in sorted(errors)]
+        }), 422
+
+    cache.invalidate('shows')
+    return jsonify({"created": len(shows), "errors": []}), 201
+
+
+@bp.route('/shows/search', methods=['GET', 'POST'])
+@query_budget.limit(4)
+def search_shows():
+    search_term = request.values.get('search_term', '')
+    page = request.args.get('page', 1, type=int)
+    per_page = current_app.config['SEARCH_RESULTS_PER_PAGE']
+    venue_page = search(Venue, search_term, page, per_page)
+    artist_page = search(Artist, search_term, page, per_page)
+    venue_data = upcoming_show_previews(Venue, Show.venue_id, [venue_id for venue_id, _ in venue_page.items])
+    artist_data = upcoming_show_previews(Artist, Show.artist_id, [artist_id for artist_id, _ in artist_page.items])
+    data = venue_data + artist_data
+    results = {
+        "count": venue_page.total + artist_page.total,
+        "data": data,
+        "venue_data": venue_data,
+        "artist_data": artist_data,
+        "page": venue_page.page,
+        "has_next": venue_page.page * per_page < max(venue_page.total, artist_page.total)
+    }
+
+    return render_template('pages/search_shows.html', results=results, search_term=search_term)
+
+
+#  API
+#  ----------------------------------------------------------------
+
+def facets_requested():
+    return request.args.get('facets') == '1'
+
+
+@bp.route('/api/venues')
+@query_budget.limit(3)
+@http_cache.conditional('venues', 'shows')
+def api_venues():
+    # ?genre=Jazz&genre=Blues&state=CA&city=...&seeking_talent=true, plus ?facets=1 for the counts
+    filters = facets.parse_filters(Venue, request.args)
+    venue_rows, next_cursor = venues_page(filters)
+    extra = {"facets": facets.facet_counts(Venue, filters)} if facets_requested() else {}
+    return api_page([{
+        "id": venue.id,
+        "name": venue.name,
+        "city": venue.city,
+        "state": venue.state,
+        "num_upcoming_shows": venue.upcoming_shows_count
+    } for venue in venue_rows], next_cursor, **extra)
+
+
+@bp.route('/api/artists')
+@query_budget.limit(3)
+@http_cache.conditional('artists')
+def api_artists():
+    # ?genre=...&state=...&city=...&seeking_venue=true, plus ?facets=1 for the counts
+    filters = facets.parse_filters(Artist, request.args)
+    artist_rows, next_cursor = artists_page(filters)
+    extra = {"facets": facets.facet_counts(Artist, filters)} if facets_requested() else {}
+    return api_page([{
+        "id": artist.id,
+        "name": artist.name
+    } for artist in artist_rows], next_cursor, **extra)
+
+
+@bp.route('/api/shows')
+@query_budget.limit(2)
+@http_cache.conditional('shows', 'venues', 'artists', clock=True)
+def api_shows():
+    show_rows, next_cursor = shows_page(show_filters(request.args))
+    return api_page([{
+        "id": show.id,
+        "start_time": show.start_time.isoformat(),
+        "artist_id": show.artist_id,
+        "artist_name": show.artist_name,
+        "artist_image_link": show.artist_image_link,
+        "venue_id": show.venue_id,
+        "venue_name": show.venue_name
+    } for show in show_rows], next_cursor)
+
+
+#  Error Handling
+#  ----------------------------------------------------------------
+
+@bp.app_errorhandler(404)
+def not_found_error(error):
+    return render_template('errors/404.html'), 404
+
+
+@bp.app_errorhandler(500)
+def server_error(error):
+    return render_template('errors/500.html'), 500